@@ -0,0 +1,73 @@
+"""
+Throughput of classification with fixed 300-token padding against dynamic padding with length bucketing.
+
+Usage:
+    python benchmarks/bench_inference_padding.py [--posts assets/parsed_posts.csv] [--n 1024]
+
+Without --posts, tweet-like texts of random length are generated. The classifier head is
+randomly initialised, since only speed and agreement between the two paths are measured.
+"""
+import argparse
+import random
+import time
+
+import torch
+from transformers import BertTokenizerFast
+
+from orientx2.classifier.model import BERTClassifier
+from orientx2.classifier.predictor import predict_bucketed, predict_sentiment
+from orientx2.storage import read_posts
+
+WORDS = "the vote to leave or remain in the european union is a matter for the british people and parliament".split()
+
+
+def synthetic_posts(n, seed=0):
+    rng = random.Random(seed)
+    # Most tweets are short, a few run to the 280-character limit
+    return [' '.join(rng.choice(WORDS) for _ in range(min(50, int(rng.expovariate(1 / 14)) + 3))) for _ in range(n)]
+
+
+def fixed_length(texts, model, tokenizer, device, batch_size):
+    predictions = []
+    for i in range(0, len(texts), batch_size):
+        predictions.extend(predict_sentiment(texts[i:i + batch_size], model, tokenizer, device, padding='max_length'))
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model-name', default='bert-base-uncased')
+    parser.add_argument('--posts', default=None, help="CSV or Parquet of parsed posts to sample from")
+    parser.add_argument('--n', type=int, default=1024, help="Number of posts to classify")
+    parser.add_argument('--fixed-batch-size', type=int, default=256, help="Rows per batch on the fixed path")
+    parser.add_argument('--bucket-batch-size', type=int, default=32, help="Rows per batch when bucketing")
+    args = parser.parse_args()
+
+    if args.posts:
+        texts = read_posts(args.posts, columns=['content'])['content'].dropna().head(args.n).tolist()
+    else:
+        texts = synthetic_posts(args.n)
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = BertTokenizerFast.from_pretrained(args.model_name)
+    model = BERTClassifier(args.model_name, 3, device=device).to(device)
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=300)['input_ids']]
+    print(f"{len(texts)} posts, mean length {sum(lengths) / len(lengths):.1f} tokens, max {max(lengths)}")
+
+    results = {}
+    for name, run in [
+        ("fixed 300", lambda: fixed_length(texts, model, tokenizer, device, args.fixed_batch_size)),
+        ("dynamic + buckets", lambda: predict_bucketed(texts, model, tokenizer, device,
+                                                       batch_size=args.bucket_batch_size)),
+    ]:
+        start = time.perf_counter()
+        results[name] = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18}: {elapsed:.2f} s  ({len(texts) / elapsed:.1f} posts/s)")
+
+    agreement = sum(a == b for a, b in zip(results["fixed 300"], results["dynamic + buckets"])) / len(texts)
+    print(f"Prediction agreement: {agreement:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Micro-benchmark of the parser's Twitter timestamp parsing against plain strptime.
+
+Usage:
+    python benchmarks/bench_parse_date.py [--n 200000]
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from orientx2.parser import parser
+
+
+def make_timestamps(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2012, 10, 23)
+    span = int((datetime(2016, 4, 4) - start).total_seconds())
+    return [(start + timedelta(seconds=rng.randrange(span))).strftime(parser.TWITTER_DATE_FORMAT) for _ in range(n)]
+
+
+def strptime_parse(timestamps):
+    return [datetime.strptime(ts, parser.TWITTER_DATE_FORMAT) for ts in timestamps]
+
+
+def fast_parse(timestamps):
+    return [parser._parse_date(ts) for ts in timestamps]
+
+
+def day_filter(timestamps, start_date=datetime(2014, 1, 1), end_date=datetime(2014, 12, 31)):
+    """Reject out-of-range tweets on the raw string, building datetimes only for the rest."""
+    start_day, end_day = start_date.date(), end_date.date()
+    return [parser._parse_date(ts) for ts in timestamps if start_day <= parser._parse_day(ts) <= end_day]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--n', type=int, default=200_000, help="Number of timestamps to parse")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="Number of timed runs (best is reported)")
+    args = arg_parser.parse_args()
+
+    timestamps = make_timestamps(args.n)
+    assert strptime_parse(timestamps) == fast_parse(timestamps)
+
+    results = {}
+    for name, func in [("strptime", strptime_parse), ("fast", fast_parse), ("fast + day filter", day_filter)]:
+        best = min(timeit.repeat(lambda: func(timestamps), number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:>18}: {best:.3f} s  ({best / args.n * 1e9:.0f} ns/timestamp)")
+
+    print(f"Speed-up over strptime: {results['strptime'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load generator for the classification server started with `orientx2-classify serve`.
+
+Usage:
+    python benchmarks/load_generator.py [--port 8080 | --unix-socket PATH] [--concurrency 64] [--duration 30]
+
+Each simulated client keeps one connection open and sends POST /classify requests back to back.
+Client-side latency percentiles and throughput are printed, followed by the server's /metrics.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+WORDS = "the vote to leave or remain in the european union is a matter for the british people and parliament".split()
+
+
+def random_post(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(min(50, int(rng.expovariate(1 / 14)) + 3)))
+
+
+async def open_connection(args):
+    if args.unix_socket:
+        return await asyncio.open_unix_connection(args.unix_socket)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(args, seed, deadline, results):
+    rng = random.Random(seed)
+    reader, writer = await open_connection(args)
+    try:
+        while time.monotonic() < deadline:
+            texts = [random_post(rng) for _ in range(args.texts_per_request)]
+            start = time.monotonic()
+            status, _ = await request(reader, writer, 'POST', '/classify', {'texts': texts})
+            if status == 200:
+                results['latencies'].append(time.monotonic() - start)
+                results['texts'] += len(texts)
+            elif status == 503:
+                results['rejected'] += 1
+                await asyncio.sleep(0.01)
+            else:
+                results['errors'] += 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))]
+
+
+async def run(args):
+    results = {'latencies': [], 'texts': 0, 'rejected': 0, 'errors': 0}
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args, seed, deadline, results) for seed in range(args.concurrency)))
+    elapsed = time.monotonic() - start
+
+    latencies = sorted(results['latencies'])
+    print(f"{len(latencies)} requests ({results['texts']} posts) in {elapsed:.1f} s with {args.concurrency} clients")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} requests/s, {results['texts'] / elapsed:.1f} posts/s")
+    print(f"Latency: p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"Rejected (503): {results['rejected']}, errors: {results['errors']}")
+
+    reader, writer = await open_connection(args)
+    _, metrics = await request(reader, writer, 'GET', '/metrics')
+    writer.close()
+    print(f"Server metrics: {json.dumps(metrics, indent=4)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix-socket', default=None)
+    parser.add_argument('--concurrency', type=int, default=64, help="Number of simultaneous clients")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds to send requests for")
+    parser.add_argument('--texts-per-request', type=int, default=1, help="Posts sent in each request")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
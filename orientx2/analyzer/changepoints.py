@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from scipy.ndimage import maximum_filter1d
+from cube import load_cube
+from event_engine import DayLabelCounts, scan_events, significance_stars
+
+GROUP_COLUMNS = ('party', 'referendum vote')
+
+
+def benjamini_hochberg(p_values):
+    """
+    Return Benjamini-Hochberg adjusted p-values (q-values) controlling the false discovery rate.
+
+    NaN p-values (untestable windows) stay NaN and do not count towards the number of tests.
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    q_values = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if len(valid) == 0:
+        return q_values
+
+    order = valid[np.argsort(p_values[valid])]
+    ranked = p_values[order] * len(valid) / np.arange(1, len(valid) + 1)
+    # q-values are the running minimum from the largest p-value down
+    q_values[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q_values
+
+
+def local_peaks(results, column='z_stat'):
+    """
+    Keep the rows whose |statistic| is the largest within one window size on either side.
+
+    A single break makes neighbouring days significant too; this keeps one row per break for
+    each label and window size. results must hold one row per consecutive day for each.
+    """
+    keep = np.zeros(len(results), dtype=bool)
+    strength = results[column].abs().fillna(0).to_numpy()
+
+    for _, rows in results.groupby(['label', 'window_size'], sort=False).indices.items():
+        rows = rows[np.argsort(results['event_day'].to_numpy()[rows])]
+        window_size = int(results['window_size'].iloc[rows[0]])
+        values = strength[rows]
+        neighbourhood_max = maximum_filter1d(values, size=2 * window_size + 1, mode='constant', cval=0)
+        keep[rows] = (values == neighbourhood_max) & (values > 0)
+    return results[keep]
+
+
+def scan_changepoints(df, labels=(0, 1, 2), window_sizes=(14, 30, 60), group_columns=GROUP_COLUMNS,
+                      alpha=0.05, min_posts=30):
+    """
+    Find breaks in the share of each label by testing every day as a candidate event.
+
+    For all posts, and for each group of posts by group_columns (e.g. Conservative Remain),
+    the before/after proportion test is run at every day and window size, on the daily counts
+    with prefix sums, so the scan is linear in days x windows x labels. Days where either
+    window has fewer than min_posts posts are skipped. The p-values of all tests are corrected
+    together with Benjamini-Hochberg, and only the strongest day around each break is kept.
+
+    Args:
+        df (pd.DataFrame): Posts with 'date', 'day_index', 'orientation' and group_columns.
+        labels (tuple): Labels whose shares are tested.
+        window_sizes (tuple): Window sizes in days.
+        group_columns (tuple): Columns to group posts by; () tests all posts only.
+        alpha (float): False discovery rate of the reported breaks.
+        min_posts (int): Fewest posts a window needs for its day to be tested.
+
+    Returns:
+        pd.DataFrame: The breaks with q-value below alpha, most significant first.
+    """
+    start_date = df['date'].min()
+    groups = [("All", df)]
+    if group_columns:
+        groups += [(' '.join(map(str, key if isinstance(key, tuple) else (key,))), group_df)
+                   for key, group_df in df.groupby(list(group_columns))]
+
+    group_counts = [(group, DayLabelCounts.from_df(group_df, labels)) for group, group_df in groups]
+    return scan_group_counts(group_counts, window_sizes, start_date, alpha, min_posts)
+
+
+def scan_cube_changepoints(cube, labels=(0, 1, 2), window_sizes=(14, 30, 60), alpha=0.05, min_posts=30):
+    """scan_changepoints for all posts and each party and referendum vote, from an AggregateCube."""
+    group_counts = [("All", cube.day_label_counts(labels=labels))]
+    group_counts += [(f"{party} {vote}", cube.day_label_counts(party, vote, labels)) for party, vote in cube.groups()]
+    return scan_group_counts(group_counts, window_sizes, cube.start_date, alpha, min_posts)
+
+
+def scan_group_counts(group_counts, window_sizes, start_date=None, alpha=0.05, min_posts=30):
+    """
+    Scan every day of each group's DayLabelCounts and return the ranked breaks.
+
+    Args:
+        group_counts (list): (group name, DayLabelCounts) pairs.
+        window_sizes (tuple): Window sizes in days.
+        start_date (Timestamp): Start of day index 0, to add the date of each break (see day_dates).
+        alpha (float): False discovery rate of the reported breaks.
+        min_posts (int): Fewest posts a window needs for its day to be tested.
+    """
+    tables = []
+    for group, counts in group_counts:
+        event_days = np.arange(counts.first_day, counts.first_day + counts.num_days)
+        results = scan_events(counts, event_days, window_sizes, start_date)
+
+        testable = (results['before_total'] >= min_posts) & (results['after_total'] >= min_posts)
+        results.loc[~testable, ['z_stat', 'p_value']] = np.nan
+        results.insert(0, 'group', group)
+        tables.append(results)
+
+    results = pd.concat(tables, ignore_index=True)
+    results['q_value'] = benjamini_hochberg(results['p_value'])
+    results['significance'] = significance_stars(results['q_value'].fillna(1.0))
+
+    breaks = pd.concat([local_peaks(group_results) for _, group_results in results.groupby('group', sort=False)])
+    breaks = breaks[breaks['q_value'] < alpha]
+    breaks = breaks.assign(abs_z=breaks['z_stat'].abs()).sort_values(['q_value', 'abs_z'], ascending=[True, False])
+    return breaks.drop(columns='abs_z').reset_index(drop=True)
+
+
+def find_breaks(csv_file, labels=(0, 1, 2), window_sizes=(14, 30, 60), alpha=0.05, cube=None):
+    if cube is None:
+        cube = load_cube(csv_file)
+    return scan_cube_changepoints(cube, labels, window_sizes, alpha)
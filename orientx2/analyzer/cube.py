@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pandas as pd
+from utils import load_data
+from event_engine import DayLabelCounts
+
+CUBE_VERSION = 1
+
+# Columns of the classified posts the cube is built from
+CUBE_COLUMNS = ['date', 'name', 'party', 'referendum vote', 'orientation']
+MEMBER_COLUMNS = ['name', 'party', 'referendum vote']
+
+
+class AggregateCube:
+    """
+    Post counts per day, party, referendum vote, MP and label, built once from the classified posts.
+
+    An MP has one party and one referendum vote, so the cube stores counts per day, member and
+    label, where a member is a distinct (name, party, referendum vote) of the posts; summing
+    over the members of a party and vote gives the counts of that group. The last label column
+    counts the posts with no label, so the totals include them as the row-level code did.
+    Day 0 starts at the date of the first post, as in add_day_index.
+
+    Args:
+        counts (np.ndarray): (days, members, labels + 1) counts.
+        members (pd.DataFrame): 'name', 'party' and 'referendum vote' of each member; missing
+            values are empty strings.
+        labels (tuple): The labels counted.
+        start_date (Timestamp): Date of the first post.
+        end_date (Timestamp): Date of the last post.
+        source (dict): Size and modification time of the posts file the cube was built from.
+    """
+
+    def __init__(self, counts, members, labels, start_date, end_date, source=None):
+        self.counts = counts
+        self.members = members.reset_index(drop=True)
+        self.labels = tuple(labels)
+        self.start_date = pd.Timestamp(start_date)
+        self.end_date = pd.Timestamp(end_date)
+        self.source = source
+
+    @classmethod
+    def from_df(cls, df, labels=(0, 1, 2)):
+        """
+        Aggregate classified posts with 'date', 'orientation' and the MEMBER_COLUMNS.
+
+        Posts with a missing date are left out, as the row-level groupbys on the day did.
+        """
+        df = df[df['date'].notna()]
+        start_date, end_date = df['date'].min(), df['date'].max()
+        days = (df['date'] - start_date).dt.days.to_numpy(dtype=np.int64)
+        num_days = int(days.max()) + 1 if len(days) else 0
+
+        keys = df[MEMBER_COLUMNS].astype(object).fillna('').astype(str)
+        codes, members = pd.MultiIndex.from_frame(keys).factorize()
+        num_members, num_labels = len(members), len(labels)
+
+        # Label column num_labels collects the posts with no label (or one not in labels)
+        orientation = pd.to_numeric(df['orientation'], errors='coerce').to_numpy()
+        label_codes = np.full(len(df), num_labels)
+        for column, label in enumerate(labels):
+            label_codes[orientation == label] = column
+
+        flat = (days * num_members + codes) * (num_labels + 1) + label_codes
+        counts = np.bincount(flat, minlength=num_days * num_members * (num_labels + 1))
+        counts = counts.reshape(num_days, num_members, num_labels + 1).astype(np.int32)
+        return cls(counts, members.to_frame(index=False, name=MEMBER_COLUMNS), labels, start_date, end_date)
+
+    @property
+    def num_days(self):
+        return self.counts.shape[0]
+
+    def groups(self):
+        """Return the (party, referendum vote) pairs with posts, leaving out missing values."""
+        pairs = self.members[['party', 'referendum vote']].drop_duplicates()
+        pairs = pairs[(pairs['party'] != '') & (pairs['referendum vote'] != '')]
+        return list(pairs.sort_values(['party', 'referendum vote']).itertuples(index=False, name=None))
+
+    def member_mask(self, party=None, vote=None):
+        """Return which members belong to a party and referendum vote; None selects all."""
+        mask = np.ones(len(self.members), dtype=bool)
+        if party is not None:
+            mask &= (self.members['party'] == party).to_numpy()
+        if vote is not None:
+            mask &= (self.members['referendum vote'] == vote).to_numpy()
+        return mask
+
+    def label_counts(self, party=None, vote=None, labels=None):
+        """
+        Return (label counts, totals) per day of the posts of a party and referendum vote.
+
+        Label counts have one column per label (all of the cube's labels when labels is None);
+        totals count every post of the group, labelled or not.
+        """
+        counts = self.counts[:, self.member_mask(party, vote)].sum(axis=1, dtype=np.int64)
+        columns = [self.labels.index(label) for label in (labels if labels is not None else self.labels)]
+        return counts[:, columns], counts.sum(axis=1)
+
+    def day_label_counts(self, party=None, vote=None, labels=None):
+        """Return a DayLabelCounts of the posts of a party and referendum vote."""
+        counts, totals = self.label_counts(party, vote, labels)
+        return DayLabelCounts.from_counts(counts, totals, labels if labels is not None else self.labels)
+
+    @property
+    def num_mps(self):
+        """Number of distinct MP names; posts without a name belong to no MP."""
+        return self.members.loc[self.members['name'] != '', 'name'].nunique()
+
+    def mp_counts(self, party=None, vote=None):
+        """
+        Return the (days, MPs, labels + 1) counts and the names of a party and vote's MPs.
+
+        The members of one name (an MP whose party or vote is missing on some posts) are
+        summed into one MP, and posts without a name are left out.
+        """
+        mask = self.member_mask(party, vote) & (self.members['name'] != '').to_numpy()
+        codes, names = pd.factorize(self.members['name'].to_numpy()[mask])
+        # Sum member counts into their MP along the leading axis, then put the days first again
+        counts = np.zeros((len(names), self.num_days, self.counts.shape[2]), dtype=self.counts.dtype)
+        np.add.at(counts, codes, np.moveaxis(self.counts[:, mask], 1, 0))
+        return np.moveaxis(counts, 0, 1), np.asarray(names)
+
+    def save(self, path):
+        source = self.source or {}
+        np.savez_compressed(
+            path,
+            version=CUBE_VERSION,
+            counts=self.counts,
+            labels=np.asarray(self.labels),
+            start_date=str(self.start_date),
+            end_date=str(self.end_date),
+            source_size=source.get('size', -1),
+            source_mtime_ns=source.get('mtime_ns', -1),
+            **{column: self.members[column].to_numpy(dtype=str) for column in MEMBER_COLUMNS},
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data['version']) != CUBE_VERSION:
+                raise ValueError(f"Cube {path} has version {int(data['version'])}, expected {CUBE_VERSION}.")
+            members = pd.DataFrame({column: data[column].astype(object) for column in MEMBER_COLUMNS})
+            source = {'size': int(data['source_size']), 'mtime_ns': int(data['source_mtime_ns'])}
+            return cls(data['counts'], members, tuple(data['labels'].tolist()), str(data['start_date']),
+                       str(data['end_date']), source)
+
+
+def cube_path_for(posts_path):
+    """Return the default cube path of a posts file: <stem>_cube.npz next to it."""
+    root, _ = os.path.splitext(posts_path)
+    return f"{root}_cube.npz"
+
+
+def load_cube(posts_path, cube_path=None, labels=(0, 1, 2), rebuild=False):
+    """
+    Load the aggregate cube of a classified posts file, building and saving it first if needed.
+
+    The cube is rebuilt when it is missing, was built with other labels, or the posts file
+    has changed size or modification time since.
+    """
+    cube_path = cube_path or cube_path_for(posts_path)
+    stat = os.stat(posts_path)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    if not rebuild and os.path.exists(cube_path):
+        cube = AggregateCube.load(cube_path)
+        if cube.source == source and cube.labels == tuple(labels):
+            return cube
+
+    cube = AggregateCube.from_df(load_data(posts_path, columns=CUBE_COLUMNS), labels)
+    cube.source = source
+    cube.save(cube_path)
+    print(f"Saved aggregate cube of {cube.num_days} days and {cube.num_mps} MPs to {cube_path}")
+    return cube
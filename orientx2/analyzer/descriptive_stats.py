@@ -1,12 +1,16 @@
 import matplotlib.pyplot as plt
-from statsmodels.nonparametric.smoothers_lowess import lowess
+import numpy as np
+import pandas as pd
 from timeline import plot_timeline_events
-from utils import load_data, add_day_index, prepare_orientation_data
+from cube import load_cube
+from smoothing import smooth_series
 
-
-def apply_lowess_smoothing(df, x_col, y_col, frac=0.05):
-    smoothed = lowess(df[y_col], df[x_col], frac=frac, return_sorted=True)
-    return smoothed
+CATEGORIES = [
+    ('Conservative', 'Remain'),
+    ('Conservative', 'Leave'),
+    ('Labour', 'Remain'),
+    ('Labour', 'Leave'),
+]
 
 
 def get_daily_counts(data):
@@ -15,51 +19,63 @@ def get_daily_counts(data):
     return daily_counts
 
 
-def get_smoothed_category_data(data):
-    daily_counts = get_daily_counts(data)
-    smoothed = apply_lowess_smoothing(daily_counts, 'day_index', 'percentage')
-    return smoothed
+def get_cube_daily_counts(cube, graph_label, party=None, vote=None):
+    """Return the daily counts of get_daily_counts for one label and group, from an AggregateCube."""
+    counts, totals = cube.label_counts(party, vote, labels=(graph_label,))
+    days = np.flatnonzero(totals)
+    daily_counts = pd.DataFrame({'day_index': days, 'sum': counts[days, 0], 'size': totals[days]})
+    daily_counts['percentage'] = (daily_counts['sum'] / daily_counts['size']) * 100
+    return daily_counts
+
+
+def get_smoothed_categories(cube, graph_label, categories=CATEGORIES, smoother="lowess", frac=0.05):
+    """
+    Smooth the daily percentage of posts with graph_label of every category in one call.
 
+    Returns:
+        tuple: (percentages, smoothed), both (categories, days) arrays; days on which a
+        category has no posts are NaN in percentages.
+    """
+    percentages = np.full((len(categories), cube.num_days), np.nan)
+    for row, (party, vote) in enumerate(categories):
+        daily_counts = get_cube_daily_counts(cube, graph_label, party, vote)
+        percentages[row, daily_counts['day_index']] = daily_counts['percentage']
+    return percentages, smooth_series(percentages, smoother, frac)
 
-def plot_smoothed_category_data(ax, data, label):
-    smoothed = get_smoothed_category_data(data)
-    ax.plot(smoothed[:, 0], smoothed[:, 1], label=f"{label} (Percentage)", linewidth=2)
 
+def plot_smoothed_category_data(ax, percentages, smoothed, label):
+    days = np.flatnonzero(~np.isnan(percentages))
+    ax.plot(days, smoothed[days], label=f"{label} (Percentage)", linewidth=2)
 
-def plot_post_frequency(ax, df):
-    post_freq = df.groupby('day_index').size().reset_index(name='post_count')
-    ax.plot(post_freq['day_index'], post_freq['post_count'], color='gray', linestyle='--',
-            label="Post Frequency", alpha=0.7)
 
+def plot_post_frequency(ax, cube):
+    _, totals = cube.label_counts()
+    days = np.flatnonzero(totals)
+    ax.plot(days, totals[days], color='gray', linestyle='--', label="Post Frequency", alpha=0.7)
 
-def process_and_plot(csv_file, graph_label):
-    df = load_data(csv_file)
-    start_date, end_date = df['date'].min(), df['date'].max()
 
-    df = add_day_index(df, start_date)
-    df = prepare_orientation_data(df, graph_label)
+def process_and_plot(csv_file, graph_label, cube=None, smoother="lowess"):
+    """
+    Plot the smoothed share of posts with graph_label per party and vote, from the posts' aggregate cube.
 
-    categories = [
-        ('Conservative', 'Remain'),
-        ('Conservative', 'Leave'),
-        ('Labour', 'Remain'),
-        ('Labour', 'Leave'),
-    ]
-    category_data = {
-        f"{party} {vote}": df[(df['party'] == party) & (df['referendum vote'] == vote)]
-        for party, vote in categories
-    }
+    smoother is one of smoothing.SMOOTHERS; 'statsmodels' gives the original per-category lowess.
+    """
+    if cube is None:
+        cube = load_cube(csv_file)
+    start_date, end_date = cube.start_date, cube.end_date
+    last_day = cube.num_days - 1
 
     fig, ax1 = plt.subplots(figsize=(16, 8))
-    for label, data in category_data.items():
-        plot_smoothed_category_data(ax1, data, label)
+    percentages, smoothed = get_smoothed_categories(cube, graph_label, CATEGORIES, smoother)
+    for row, (party, vote) in enumerate(CATEGORIES):
+        plot_smoothed_category_data(ax1, percentages[row], smoothed[row], f"{party} {vote}")
 
     plot_timeline_events(ax1, start_date)
     ax2 = ax1.twinx()
-    plot_post_frequency(ax2, df)
+    plot_post_frequency(ax2, cube)
 
-    ax1.set_xlim(0, df['day_index'].max())
-    ax1.set_xticks([0, df['day_index'].max()])
+    ax1.set_xlim(0, last_day)
+    ax1.set_xticks([0, last_day])
     ax1.set_xticklabels([start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')])
     ax1.set_title(f"{graph_label} and Post Frequency Over Time")
     ax1.set_xlabel(f"Days Since {start_date.strftime('%B %d, %Y')}")
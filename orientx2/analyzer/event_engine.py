@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+
+class DayLabelCounts:
+    """
+    Post counts per day and label, with prefix sums for constant-time window queries.
+
+    The posts are aggregated once into a dense day x label matrix of counts (and a vector of
+    posts per day, which also counts posts without a label). Cumulative sums over the days
+    then give the counts of any window of days as the difference of two rows, so every
+    before/after window of every candidate event costs O(1) rather than a pass over the posts.
+
+    Args:
+        day_index (array): Day of each post, as set by add_day_index. Posts with a missing day
+            (from a missing date) are left out, as the groupbys on day_index did.
+        orientation (array): Label of each post; missing values only count towards the totals.
+        labels (tuple): The labels to count.
+    """
+
+    def __init__(self, day_index, orientation, labels=(0, 1, 2)):
+        day_index = pd.to_numeric(pd.Series(day_index), errors='coerce').to_numpy(dtype=np.float64)
+        known = np.isfinite(day_index)
+        day_index = day_index[known].astype(np.int64)
+        orientation = pd.to_numeric(pd.Series(orientation), errors='coerce').to_numpy()[known]
+        self.labels = tuple(labels)
+        self.first_day = int(day_index.min()) if len(day_index) else 0
+        days = day_index - self.first_day
+        self.num_days = int(days.max()) + 1 if len(days) else 0
+
+        self.totals = np.bincount(days, minlength=self.num_days)
+        self.counts = np.zeros((self.num_days, len(self.labels)), dtype=np.int64)
+        for column, label in enumerate(self.labels):
+            self.counts[:, column] = np.bincount(days[orientation == label], minlength=self.num_days)
+        self._prefix_sums()
+
+    @classmethod
+    def from_df(cls, df, labels=(0, 1, 2)):
+        return cls(df['day_index'].to_numpy(), df['orientation'].to_numpy(), labels)
+
+    @classmethod
+    def from_counts(cls, counts, totals, labels=(0, 1, 2), first_day=0):
+        """Wrap a day x label matrix of counts and the posts per day, e.g. from an AggregateCube."""
+        self = cls.__new__(cls)
+        self.labels = tuple(labels)
+        self.first_day = first_day
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.totals = np.asarray(totals, dtype=np.int64)
+        self.num_days = len(self.totals)
+        self._prefix_sums()
+        return self
+
+    def _prefix_sums(self):
+        # Row k holds the counts of the days before day k
+        self._total_sums = np.concatenate(([0], np.cumsum(self.totals)))
+        self._count_sums = np.vstack((np.zeros((1, len(self.labels)), dtype=np.int64), np.cumsum(self.counts, axis=0)))
+
+    def window(self, first, last):
+        """
+        Return (label counts, totals) of the posts from day first to day last inclusive.
+
+        first and last are arrays of day indices of any (matching) shape; days outside the data
+        count as empty. Label counts have an extra trailing axis, one entry per label.
+        """
+        start = np.clip(np.asarray(first) - self.first_day, 0, self.num_days)
+        stop = np.clip(np.asarray(last) - self.first_day + 1, 0, self.num_days)
+        stop = np.maximum(stop, start)
+        return self._count_sums[stop] - self._count_sums[start], self._total_sums[stop] - self._total_sums[start]
+
+    def event_windows(self, event_days, window_sizes):
+        """
+        Return the counts of the windows before and after each event, for each window size.
+
+        The before window is [event - w, event) and the after window (event, event + w], so the
+        event day itself is in neither.
+
+        Returns:
+            tuple: (before counts, before totals, after counts, after totals), with shapes
+            (events, windows, labels) for the counts and (events, windows) for the totals.
+        """
+        event_days = np.asarray(event_days, dtype=np.int64)[:, None]
+        window_sizes = np.asarray(window_sizes, dtype=np.int64)[None, :]
+        before_count, before_total = self.window(event_days - window_sizes, event_days - 1)
+        after_count, after_total = self.window(event_days + 1, event_days + window_sizes)
+        return before_count, before_total, after_count, after_total
+
+
+def proportions_ztest(count1, nobs1, count2, nobs2):
+    """
+    Two-sided pooled z-test for equal proportions, vectorised over arrays of any shape.
+
+    Gives the same statistic and p-value as statsmodels' proportions_ztest([count1, count2],
+    [nobs1, nobs2]); where the test is undefined (an empty group, or a pooled proportion of
+    0 or 1) the results are NaN or infinite as they are there.
+
+    Returns:
+        tuple: (z statistics, p-values).
+    """
+    count1, nobs1, count2, nobs2 = (np.asarray(value, dtype=np.float64) for value in (count1, nobs1, count2, nobs2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = (count1 + count2) / (nobs1 + nobs2)
+        std = np.sqrt(pooled * (1 - pooled) * (1 / nobs1 + 1 / nobs2))
+        z_stat = (count1 / nobs1 - count2 / nobs2) / std
+    p_value = 2 * norm.sf(np.abs(z_stat))
+    return z_stat, p_value
+
+
+def significance_stars(p_values):
+    """Return '**' for p < 0.01, '*' for p < 0.05 and '' otherwise, for an array of p-values."""
+    p_values = np.asarray(p_values)
+    return np.where(p_values < 0.01, "**", np.where(p_values < 0.05, "*", ""))
+
+
+def day_dates(days, start_date):
+    """
+    Return the calendar date of each day index, the inverse of event_day_index.
+
+    Day k runs for 24 hours from start_date + k days, so it holds the midnight of exactly one
+    date: the date event_day_index maps to day k. Dates have no time of day.
+    """
+    return (pd.Timestamp(start_date) + pd.to_timedelta(days, unit='D')).dt.ceil('D')
+
+
+def scan_events(counts, event_days, window_sizes, start_date=None):
+    """
+    Test every (event day, window size, label) for a change in the share of posts with the label.
+
+    Args:
+        counts (DayLabelCounts): Posts per day and label.
+        event_days (array): Candidate event days, as day indices.
+        window_sizes (list): Window sizes in days.
+        start_date (Timestamp): Start of day index 0, to add the date of each event day (see day_dates).
+
+    Returns:
+        pd.DataFrame: One row per event day, window size and label, with the counts, shares
+        before and after, z statistic, p-value and significance stars.
+    """
+    event_days = np.asarray(event_days, dtype=np.int64)
+    window_sizes = np.asarray(window_sizes, dtype=np.int64)
+    before_count, before_total, after_count, after_total = counts.event_windows(event_days, window_sizes)
+
+    shape = before_count.shape
+    before_total = np.broadcast_to(before_total[..., None], shape)
+    after_total = np.broadcast_to(after_total[..., None], shape)
+    z_stat, p_value = proportions_ztest(before_count, before_total, after_count, after_total)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        before_ratio = np.where(before_total > 0, before_count / before_total, 0.0)
+        after_ratio = np.where(after_total > 0, after_count / after_total, 0.0)
+
+    events, windows, labels = np.meshgrid(np.arange(len(event_days)), np.arange(len(window_sizes)),
+                                          np.arange(len(counts.labels)), indexing='ij')
+    results = pd.DataFrame({
+        "event_day": event_days[events.ravel()],
+        "window_size": window_sizes[windows.ravel()],
+        "label": np.asarray(counts.labels)[labels.ravel()],
+        "before_percentage": before_ratio.ravel(),
+        "before_count": before_count.ravel(),
+        "before_total": before_total.ravel(),
+        "after_percentage": after_ratio.ravel(),
+        "after_count": after_count.ravel(),
+        "after_total": after_total.ravel(),
+        "z_stat": z_stat.ravel(),
+        "p_value": p_value.ravel(),
+        "significance": significance_stars(p_value.ravel()),
+    })
+    if start_date is not None:
+        results.insert(1, "event_date", day_dates(results["event_day"], start_date))
+    return results
@@ -1,11 +1,21 @@
 from descriptive_stats import process_and_plot
 from significance_tests import analyze_events
+from changepoints import find_breaks
+from resampling import resample_timeline_events
+from cube import load_cube
 
 classified_posts = "/Users/josephhirsh/Documents/GitHub/orientx2/assets/classified_posts_for_stats.csv"
 
+# Guarded so the process pool's workers, which re-import this module under the spawn start
+# method (the default on macOS), do not run the analysis themselves
+if __name__ == "__main__":
+    # Built once from the posts and saved next to them; the outputs below only read the cube
+    cube = load_cube(classified_posts)
 
-# process_and_plot(classified_posts, 0)
-# process_and_plot(classified_posts, 1)
-# process_and_plot(classified_posts, 2)
+    # process_and_plot(classified_posts, 0, cube)
+    # process_and_plot(classified_posts, 1, cube)
+    # process_and_plot(classified_posts, 2, cube)
 
-print(analyze_events(classified_posts))
+    print(analyze_events(classified_posts, cube=cube))
+    # print(find_breaks(classified_posts, cube=cube).head(20))
+    # print(resample_timeline_events(classified_posts, workers=4, cube=cube))
@@ -0,0 +1,251 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from cube import load_cube
+from event_engine import day_dates
+from timeline import TIMELINE_EVENTS
+from significance_tests import event_day_index
+
+N_RESAMPLES = 10_000
+
+# Resamples drawn at once; bounds the (resamples x MPs) weight matrices to a few MB
+RESAMPLE_BLOCK = 1000
+
+
+class MpDayCounts:
+    """
+    Post counts per day, MP and label, with prefix sums over the days.
+
+    Like DayLabelCounts, but keeping each MP's posts apart, so the counts of every MP in any
+    window of days are the difference of two rows. Resampling then works on the MPs' window
+    counts rather than on the posts. Posts without an MP or a day are left out.
+
+    Args:
+        day_index (array): Day of each post, as set by add_day_index.
+        mp (array): Name of the MP behind each post.
+        orientation (array): Label of each post; missing values only count towards the totals.
+        labels (tuple): The labels to count.
+    """
+
+    def __init__(self, day_index, mp, orientation, labels=(0, 1, 2)):
+        codes, self.mps = pd.factorize(pd.Series(mp))
+        day_index = pd.to_numeric(pd.Series(day_index), errors='coerce').to_numpy(dtype=np.float64)
+        known = (codes >= 0) & np.isfinite(day_index)
+        codes = codes[known]
+        day_index = day_index[known].astype(np.int64)
+        orientation = pd.to_numeric(pd.Series(orientation), errors='coerce').to_numpy()[known]
+
+        self.labels = tuple(labels)
+        self.first_day = int(day_index.min()) if len(day_index) else 0
+        days = day_index - self.first_day
+        self.num_days = int(days.max()) + 1 if len(days) else 0
+        num_mps, num_labels = len(self.mps), len(self.labels)
+
+        # Label column num_labels collects the posts with no label (or one not in labels)
+        label_codes = np.full(len(days), num_labels)
+        for column, label in enumerate(self.labels):
+            label_codes[orientation == label] = column
+        flat = (days * num_mps + codes) * (num_labels + 1) + label_codes
+        counts = np.bincount(flat, minlength=self.num_days * num_mps * (num_labels + 1))
+        self._prefix_sums(counts.reshape(self.num_days, num_mps, num_labels + 1))
+
+    @classmethod
+    def from_df(cls, df, labels=(0, 1, 2), mp_column='name'):
+        return cls(df['day_index'].to_numpy(), df[mp_column].to_numpy(), df['orientation'].to_numpy(), labels)
+
+    @classmethod
+    def from_counts(cls, counts, mps, labels=(0, 1, 2), first_day=0):
+        """
+        Wrap a day x MP x label array of counts, e.g. from an AggregateCube.
+
+        The last label column holds the posts with no label, so counts has len(labels) + 1 columns.
+        """
+        self = cls.__new__(cls)
+        self.mps = pd.Index(mps)
+        self.labels = tuple(labels)
+        self.first_day = first_day
+        self.num_days = counts.shape[0]
+        self._prefix_sums(counts)
+        return self
+
+    def _prefix_sums(self, counts):
+        # Row k holds the counts of the days before day k
+        zeros = np.zeros((1,) + counts.shape[1:], dtype=np.int32)
+        sums = np.concatenate((zeros, np.cumsum(counts, axis=0, dtype=np.int32)))
+        self._count_sums = sums[:, :, :len(self.labels)]
+        self._total_sums = sums.sum(axis=2)
+
+    def window(self, first, last):
+        """Return (label counts, totals) of each MP from day first to day last inclusive."""
+        start = min(max(first - self.first_day, 0), self.num_days)
+        stop = max(min(last - self.first_day + 1, self.num_days), start)
+        return self._count_sums[stop] - self._count_sums[start], self._total_sums[stop] - self._total_sums[start]
+
+    def event_window(self, event_day, window_size):
+        """
+        Return each MP's counts in the windows before and after an event.
+
+        The windows are those of DayLabelCounts.event_windows: [event - w, event) and
+        (event, event + w]. Only the MPs with posts in either window are returned.
+
+        Returns:
+            tuple: (before counts, before totals, after counts, after totals), with shapes
+            (MPs, labels) for the counts and (MPs,) for the totals.
+        """
+        before_count, before_total = self.window(event_day - window_size, event_day - 1)
+        after_count, after_total = self.window(event_day + 1, event_day + window_size)
+        active = (before_total + after_total) > 0
+        return before_count[active], before_total[active], after_count[active], after_total[active]
+
+
+def resample_event(before_count, before_total, after_count, after_total, n_resamples=N_RESAMPLES, seed=None):
+    """
+    Permutation and MP-clustered bootstrap tests of a change in label shares across an event.
+
+    The statistic is the share of posts with each label after the event minus the share
+    before. The permutation test swaps the before and after windows of each MP with
+    probability 1/2, so an MP's posts move together and prolific accounts cannot make a
+    change look more certain than their number allows. The bootstrap draws MPs with
+    replacement and gives a percentile confidence interval and p-value of the difference.
+
+    Args:
+        before_count, before_total, after_count, after_total: Per-MP window counts, as
+            returned by MpDayCounts.event_window.
+        n_resamples (int): Permutations and bootstrap samples to draw.
+        seed: Seed or SeedSequence of the random generator.
+
+    Returns:
+        dict: Arrays with one entry per label: 'difference', 'permutation_p', 'bootstrap_p',
+        'ci_low' and 'ci_high' (a 95% interval), and the number of 'mps'.
+    """
+    rng = np.random.default_rng(seed)
+    before_count, after_count = before_count.astype(np.float64), after_count.astype(np.float64)
+    before_total, after_total = before_total.astype(np.float64), after_total.astype(np.float64)
+    num_mps, num_labels = before_count.shape
+
+    pooled_count = before_count.sum(axis=0) + after_count.sum(axis=0)
+    pooled_total = before_total.sum() + after_total.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed = after_count.sum(axis=0) / after_total.sum() - before_count.sum(axis=0) / before_total.sum()
+
+    extreme = np.zeros(num_labels)
+    valid_permutations = np.zeros(num_labels)
+    bootstrap = np.empty((n_resamples, num_labels))
+    for start in range(0, n_resamples, RESAMPLE_BLOCK):
+        size = min(RESAMPLE_BLOCK, n_resamples - start)
+
+        swap = (rng.random((size, num_mps)) < 0.5).astype(np.float64)
+        permuted_count = swap @ before_count + (1 - swap) @ after_count
+        permuted_total = swap @ before_total + (1 - swap) @ after_total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            permuted = (permuted_count / permuted_total[:, None]
+                        - (pooled_count - permuted_count) / (pooled_total - permuted_total)[:, None])
+        # A small tolerance so permutations equal to the observed split count as extreme
+        extreme += (np.abs(permuted) >= np.abs(observed) - 1e-12).sum(axis=0)
+        valid_permutations += (~np.isnan(permuted)).sum(axis=0)
+
+        weights = rng.multinomial(num_mps, np.full(num_mps, 1 / num_mps), size=size).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bootstrap[start:start + size] = ((weights @ after_count) / (weights @ after_total)[:, None]
+                                             - (weights @ before_count) / (weights @ before_total)[:, None])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        permutation_p = (1 + extreme) / (1 + valid_permutations)
+        # Samples with an empty window are NaN and count on neither side
+        valid_samples = (~np.isnan(bootstrap)).sum(axis=0)
+        tail = np.minimum((bootstrap <= 0).sum(axis=0), (bootstrap >= 0).sum(axis=0))
+        bootstrap_p = np.minimum((1 + 2 * tail) / (1 + valid_samples), 1.0)
+    valid = valid_samples > 0
+    ci_low, ci_high = np.full(num_labels, np.nan), np.full(num_labels, np.nan)
+    if valid.any():
+        ci_low[valid], ci_high[valid] = np.nanpercentile(bootstrap[:, valid], [2.5, 97.5], axis=0)
+
+    return {
+        'difference': observed,
+        'permutation_p': np.where(np.isnan(observed), np.nan, permutation_p),
+        'bootstrap_p': np.where(valid, bootstrap_p, np.nan),
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'mps': num_mps,
+    }
+
+
+def resample_events(counts, event_days, window_sizes, n_resamples=N_RESAMPLES, seed=0, workers=1, start_date=None):
+    """
+    Run resample_event for every event day and window size, optionally across a process pool.
+
+    Each (event, window) gets its own random stream spawned from seed, so the results are
+    reproducible and do not depend on the number of workers.
+
+    Args:
+        counts (MpDayCounts): Posts per day, MP and label.
+        event_days (array): Event days, as day indices.
+        window_sizes (list): Window sizes in days.
+        n_resamples (int): Permutations and bootstrap samples per event and window.
+        seed (int): Seed of the random streams.
+        workers (int): Number of processes to resample with.
+        start_date (Timestamp): Start of day index 0, to add the date of each event day (see day_dates).
+
+    Returns:
+        pd.DataFrame: One row per event day, window size and label, with the MPs in the
+        windows, the shares before and after, their difference, the permutation and bootstrap
+        p-values and the bootstrap confidence interval.
+    """
+    tasks = [(int(event_day), int(window_size)) for event_day in event_days for window_size in window_sizes]
+    windows = [counts.event_window(event_day, window_size) for event_day, window_size in tasks]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+
+    if workers <= 1 or len(tasks) <= 1:
+        results = [resample_event(*window, n_resamples, task_seed) for window, task_seed in zip(windows, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_resample_window, windows, [n_resamples] * len(tasks), seeds))
+
+    rows = []
+    for (event_day, window_size), (before_count, before_total, after_count, after_total), result in zip(
+            tasks, windows, results):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            before_ratio = before_count.sum(axis=0) / before_total.sum()
+            after_ratio = after_count.sum(axis=0) / after_total.sum()
+        for column, label in enumerate(counts.labels):
+            rows.append({
+                "event_day": event_day,
+                "window_size": window_size,
+                "label": label,
+                "mps": result['mps'],
+                "before_percentage": before_ratio[column],
+                "after_percentage": after_ratio[column],
+                "difference": result['difference'][column],
+                "ci_low": result['ci_low'][column],
+                "ci_high": result['ci_high'][column],
+                "permutation_p": result['permutation_p'][column],
+                "bootstrap_p": result['bootstrap_p'][column],
+            })
+
+    results = pd.DataFrame(rows)
+    if start_date is not None and len(results):
+        results.insert(1, "event_date", day_dates(results["event_day"], start_date))
+    return results
+
+
+def resample_timeline_events(csv_file, labels=(0, 1, 2), window_size=30, n_resamples=N_RESAMPLES, seed=0, workers=1,
+                             cube=None):
+    """
+    Permutation and MP-clustered bootstrap tests of the TIMELINE_EVENTS, alongside analyze_events.
+
+    The per-MP counts come from the aggregate cube of the posts; posts without an MP name are left out.
+    """
+    if cube is None:
+        cube = load_cube(csv_file, labels=labels)
+    mp_counts, names = cube.mp_counts()
+    counts = MpDayCounts.from_counts(mp_counts, names, cube.labels)
+
+    event_days = [event_day_index(event_date, cube.start_date) for event_date, _ in TIMELINE_EVENTS]
+    results = resample_events(counts, event_days, [window_size], n_resamples, seed, workers, cube.start_date)
+    results.insert(0, "event", np.repeat([event_desc for _, event_desc in TIMELINE_EVENTS], len(cube.labels)))
+    return results
+
+
+def _resample_window(window, n_resamples, seed):
+    return resample_event(*window, n_resamples, seed)
@@ -1,61 +1,54 @@
+import numpy as np
 import pandas as pd
-from statsmodels.stats.proportion import proportions_ztest
-from utils import load_data, add_day_index
 from timeline import TIMELINE_EVENTS
+from event_engine import DayLabelCounts, scan_events
+from cube import load_cube
 
 
-def test_event_significance(df, label, event_date, window_size=300):
+def event_day_index(event_date, start_date):
+    return (pd.Timestamp(event_date) - pd.Timestamp(start_date)).days
+
+
+def test_event_significance(df, label, event_date, window_size=300, counts=None):
+    """
+    Test whether the share of posts with a label differs between the windows before and after an event.
+
+    Pass counts (a DayLabelCounts of df) when testing many events, so df is aggregated only once.
+    """
+    if counts is None:
+        counts = DayLabelCounts.from_df(df, labels=(label,))
+    event_day = event_day_index(event_date, df['date'].min())
+
+    row = scan_events(counts, [event_day], [window_size]).set_index('label').loc[label]
+    before_count, after_count = int(row['before_count']), int(row['after_count'])
+    before_total, after_total = int(row['before_total']), int(row['after_total'])
+
+    return (row['p_value'], row['before_percentage'], row['after_percentage'], before_count, after_count,
+            before_total, after_total)
+
+
+def scan_event_dates(df, event_dates, labels=(0, 1, 2), window_sizes=(30,)):
+    """
+    Test many candidate event dates and window sizes at once.
+
+    The posts are aggregated once and every test runs in a single vectorised computation, so
+    thousands of dates can be scanned in one call. Returns one row per date, window and label.
+    """
     start_date = df['date'].min()
-    event_day = (pd.Timestamp(event_date) - pd.Timestamp(start_date)).days
-
-    before = df[(df['day_index'] >= event_day - window_size) & (df['day_index'] < event_day)]
-    after = df[(df['day_index'] > event_day) & (df['day_index'] <= event_day + window_size)]
-
-    before_count = before['orientation'].value_counts().get(label, 0)
-    after_count = after['orientation'].value_counts().get(label, 0)
-
-    before_total = len(before)
-    after_total = len(after)
-
-    before_ratio = before_count / before_total if before_total > 0 else 0
-    after_ratio = after_count / after_total if after_total > 0 else 0
-
-    count = [before_count, after_count]
-    nobs = [before_total, after_total]
-    z_stat, p_value = proportions_ztest(count, nobs, alternative="two-sided")
-
-    return p_value, before_ratio, after_ratio, before_count, after_count, before_total, after_total
-
-
-def analyze_events(csv_file, labels=(0, 1, 2), window_size=30):
-    df = load_data(csv_file)
-    add_day_index(df, df['date'].min())
-    results = []
-
-    for event_date, event_desc in TIMELINE_EVENTS:
-        for label in labels:
-            p_value, before, after, before_count, after_count, before_total, after_total = test_event_significance(
-                df, label, event_date, window_size
-            )
-
-            if p_value < 0.01:
-                significance = "**"
-            elif p_value < 0.05:
-                significance = "*"
-            else:
-                significance = ""
-
-            results.append({
-                "event": event_desc,
-                "label": label,
-                "before_percentage": before,
-                "before_count": before_count,
-                "before_total": before_total,
-                "after_percentage": after,
-                "after_count": after_count,
-                "after_total": after_total,
-                "p_value": p_value,
-                "significance": significance
-            })
-
-    return pd.DataFrame(results)
+    counts = DayLabelCounts.from_df(df, labels)
+    event_days = [event_day_index(event_date, start_date) for event_date in event_dates]
+    return scan_events(counts, event_days, window_sizes, start_date)
+
+
+def analyze_events(csv_file, labels=(0, 1, 2), window_size=30, cube=None):
+    """Test the TIMELINE_EVENTS on the aggregate cube of the posts, built on first use."""
+    if cube is None:
+        cube = load_cube(csv_file)
+
+    counts = cube.day_label_counts(labels=labels)
+    event_days = [event_day_index(event_date, cube.start_date) for event_date, _ in TIMELINE_EVENTS]
+    results = scan_events(counts, event_days, [window_size], cube.start_date)
+    results.insert(0, "event", np.repeat([event_desc for _, event_desc in TIMELINE_EVENTS], len(labels)))
+
+    return results[["event", "label", "before_percentage", "before_count", "before_total", "after_percentage",
+                    "after_count", "after_total", "p_value", "significance"]]
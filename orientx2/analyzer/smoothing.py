@@ -0,0 +1,215 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+from scipy.signal import savgol_filter
+
+# Most (series x points x window) elements gathered at once by the binned LOWESS
+GATHER_ELEMENTS = 4_000_000
+
+
+def smooth_series(values, method="lowess", frac=0.05, **options):
+    """
+    Smooth a batch of series sampled on the same regular grid (e.g. one point per day) in one call.
+
+    Args:
+        values (np.ndarray): (series, points) values; NaN marks points without data, such as
+            days on which a group did not post. A single series may be passed as 1-D.
+        method (str): One of SMOOTHERS: 'lowess' (binned LOWESS), 'kernel' (Gaussian kernel),
+            'savgol' (Savitzky-Golay), 'rolling' (centred rolling mean) or 'statsmodels'
+            (statsmodels' lowess on each series, the slow reference).
+        frac (float): Span of the smoother as a fraction of the points, as in statsmodels' lowess.
+        **options: Extra arguments of the chosen smoother.
+
+    Returns:
+        np.ndarray: The smoothed values at every point, of the same shape as values. Points
+        without data get the smooth curve's value there; series without any data stay NaN.
+    """
+    if method not in SMOOTHERS:
+        raise ValueError(f"Unknown smoother '{method}'. Please choose one of {tuple(SMOOTHERS)}.")
+    values = np.asarray(values, dtype=np.float64)
+    batch = np.atleast_2d(values)
+    smoothed = np.full(batch.shape, np.nan)
+
+    # Smoothers assume each series has data; empty series are left as NaN
+    has_data = (~np.isnan(batch)).any(axis=1)
+    if has_data.any():
+        smoothed[has_data] = SMOOTHERS[method](batch[has_data], frac=frac, **options)
+    return smoothed.reshape(values.shape)
+
+
+def lowess_binned(values, frac=0.05, iterations=3, step=None):
+    """
+    LOWESS fitted at every step-th point and linearly interpolated in between.
+
+    Each fit is a local linear regression with tricube weights over the nearest
+    frac * (points with data) points, followed by `iterations` robustifying passes with
+    bisquare weights on the residuals, as in statsmodels' lowess. Fitting only every step-th
+    point, for all series at once, replaces its per-point loop with a few array operations.
+    step defaults to an eighth of the smallest neighbourhood, which keeps the interpolation
+    error well below the smoothing itself.
+    """
+    num_series, num_points = values.shape
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    neighbours = np.maximum((frac * valid.sum(axis=1) + 1e-10).astype(np.int64), 2)
+    if step is None:
+        step = max(1, int(neighbours.min()) // 8)
+    centres = np.unique(np.append(np.arange(0, num_points, step), num_points - 1))
+
+    radius = _neighbourhood_radius(valid, centres, neighbours)
+    robustness = np.ones_like(filled)
+    for iteration in range(iterations + 1):
+        fitted = _local_linear(filled, valid * robustness, centres, radius)
+        # A centre whose neighbours all get zero weight (possible in sparse series) has no fit;
+        # bridge it linearly, as the other smoothers do across gaps
+        smoothed = _fill_missing(_interpolate(fitted, centres, num_points))
+        if iteration == iterations:
+            return smoothed
+
+        residuals = np.where(valid, values - smoothed, np.nan)
+        scale = 6 * np.nanmedian(np.abs(residuals), axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            robustness = np.clip(1 - (np.nan_to_num(residuals) / scale) ** 2, 0, 1) ** 2
+        robustness[(scale == 0).ravel()] = 1.0
+
+
+def kernel_smooth(values, frac=0.05, sigma=None):
+    """
+    Gaussian kernel (Nadaraya-Watson) smoother; missing points get no weight.
+
+    sigma defaults to a fifth of the span, about the spread of LOWESS's tricube weights.
+    """
+    valid = ~np.isnan(values)
+    if sigma is None:
+        sigma = max(frac * values.shape[1] / 5, 0.5)
+    weighted = gaussian_filter1d(np.where(valid, values, 0.0), sigma, axis=1, mode='constant')
+    weights = gaussian_filter1d(valid.astype(np.float64), sigma, axis=1, mode='constant')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        smoothed = weighted / weights
+    # Gaps much wider than sigma get no weight at all; bridge them linearly
+    return _fill_missing(smoothed)
+
+
+def savgol_smooth(values, frac=0.05, polyorder=2):
+    """Savitzky-Golay filter over a window of the span; missing points are linearly interpolated first."""
+    num_points = values.shape[1]
+    window = _odd_window(frac * num_points, minimum=polyorder + 2)
+    if window > num_points:
+        window = num_points if num_points % 2 else num_points - 1
+    if window <= polyorder:
+        return _fill_missing(values)
+    return savgol_filter(_fill_missing(values), window, polyorder, axis=1, mode='interp')
+
+
+def rolling_smooth(values, frac=0.05):
+    """Centred rolling mean over a window of the span, averaging only the points with data."""
+    num_points = values.shape[1]
+    half = _odd_window(frac * num_points) // 2
+    valid = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    value_sums = np.hstack((zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)))
+    count_sums = np.hstack((zeros, np.cumsum(valid, axis=1)))
+
+    start = np.clip(np.arange(num_points) - half, 0, num_points)
+    stop = np.clip(np.arange(num_points) + half + 1, 0, num_points)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rolling = (value_sums[:, stop] - value_sums[:, start]) / (count_sums[:, stop] - count_sums[:, start])
+    # Windows with no data at all take their values from the neighbouring windows
+    return _fill_missing(rolling)
+
+
+def statsmodels_lowess(values, frac=0.05, iterations=3):
+    """statsmodels' lowess on each series in turn; the reference the other smoothers are measured against."""
+    from statsmodels.nonparametric.smoothers_lowess import lowess
+
+    points = np.arange(values.shape[1], dtype=np.float64)
+    smoothed = np.empty_like(values)
+    for row, series in enumerate(values):
+        valid = ~np.isnan(series)
+        fitted = lowess(series[valid], points[valid], frac=frac, it=iterations, return_sorted=False)
+        smoothed[row] = np.interp(points, points[valid], fitted)
+    return smoothed
+
+
+SMOOTHERS = {
+    "lowess": lowess_binned,
+    "kernel": kernel_smooth,
+    "savgol": savgol_smooth,
+    "rolling": rolling_smooth,
+    "statsmodels": statsmodels_lowess,
+}
+
+
+def _neighbourhood_radius(valid, centres, neighbours):
+    """
+    Distance from each centre to its k-th nearest point with data, for each series.
+
+    Found by a vectorised binary search on the number of points with data within a radius.
+    """
+    num_series, num_points = valid.shape
+    count_sums = np.hstack((np.zeros((num_series, 1), dtype=np.int64), np.cumsum(valid, axis=1)))
+    rows = np.arange(num_series)[:, None]
+    low = np.zeros((num_series, len(centres)), dtype=np.int64)
+    high = np.full((num_series, len(centres)), num_points, dtype=np.int64)
+    while (low < high).any():
+        middle = (low + high) // 2
+        start = np.clip(centres - middle, 0, num_points)
+        stop = np.clip(centres + middle + 1, 0, num_points)
+        enough = (count_sums[rows, stop] - count_sums[rows, start]) >= neighbours[:, None]
+        high = np.where(enough, middle, high)
+        low = np.where(enough, low, middle + 1)
+    return np.maximum(high, 1)
+
+
+def _local_linear(values, weights, centres, radius):
+    """Weighted local linear fit with tricube weights at each centre, for all series at once."""
+    num_series, num_points = values.shape
+    reach = int(radius.max())
+    offsets = np.arange(-reach, reach + 1)
+    chunk = max(1, GATHER_ELEMENTS // (num_series * len(offsets)))
+
+    fitted = np.empty((num_series, len(centres)))
+    for first in range(0, len(centres), chunk):
+        part = slice(first, first + chunk)
+        positions = centres[part, None] + offsets
+        inside = (positions >= 0) & (positions < num_points)
+        positions = np.clip(positions, 0, num_points - 1)
+
+        distance = np.abs(offsets) / radius[:, part, None]
+        w = np.clip(1 - distance ** 3, 0, None) ** 3 * weights[:, positions] * inside
+        y = values[:, positions]
+        s0, s1, s2 = w.sum(axis=2), (w * offsets).sum(axis=2), (w * offsets ** 2).sum(axis=2)
+        t0, t1 = (w * y).sum(axis=2), (w * offsets * y).sum(axis=2)
+
+        determinant = s0 * s2 - s1 ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            linear = (s2 * t0 - s1 * t1) / determinant
+            constant = t0 / s0
+        # Fall back to the weighted mean where the points cannot fix a line
+        fitted[:, part] = np.where(np.abs(determinant) > 1e-9 * np.maximum(s0 * s2, 1e-300), linear, constant)
+    return fitted
+
+
+def _interpolate(fitted, centres, num_points):
+    """Linearly interpolate values at sorted centres to every point of the grid."""
+    if len(centres) == 1:
+        return np.repeat(fitted, num_points, axis=1)
+    points = np.arange(num_points)
+    right = np.clip(np.searchsorted(centres, points, side='right'), 1, len(centres) - 1)
+    left = right - 1
+    t = (points - centres[left]) / (centres[right] - centres[left])
+    return fitted[:, left] * (1 - t) + fitted[:, right] * t
+
+
+def _fill_missing(values):
+    """Linearly interpolate NaNs from the points with data in each series."""
+    filled = values.copy()
+    points = np.arange(values.shape[1])
+    for row, series in enumerate(values):
+        missing = np.isnan(series)
+        if missing.any() and not missing.all():
+            filled[row, missing] = np.interp(points[missing], points[~missing], series[~missing])
+    return filled
+
+
+def _odd_window(span, minimum=3):
+    return max(int(span) // 2 * 2 + 1, minimum if minimum % 2 else minimum + 1)
@@ -1,10 +1,11 @@
 import pandas as pd
 
+from orientx2.storage import read_posts
 
-def load_data(csv_file):
-    df = pd.read_csv(csv_file)
-    df['date'] = pd.to_datetime(df['date'])
-    return df
+
+def load_data(csv_file, columns=None):
+    """Load classified posts from CSV or Parquet, optionally reading only some columns."""
+    return read_posts(csv_file, columns=columns)
 
 
 def add_day_index(df, start_date):
@@ -1,6 +1,6 @@
 from .data_loader import load_data
 from .trainer import ClassificationPipeline
-from .predictor import predict_sentiment
+from .predictor import predict_bucketed, predict_sentiment
 
-__all__ = ["ClassificationPipeline", "load_data", "predict_sentiment"]
+__all__ = ["ClassificationPipeline", "load_data", "predict_bucketed", "predict_sentiment"]
 
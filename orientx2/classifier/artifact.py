@@ -0,0 +1,120 @@
+import json
+import os
+from pathlib import Path
+
+import torch
+from transformers import BertConfig, BertTokenizerFast
+
+from .model import BERTClassifier
+
+ARTIFACT_VERSION = 1
+
+WEIGHTS_FILE = 'model.safetensors'
+METADATA_FILE = 'classifier.json'
+
+
+def artifact_dir_for(model_path):
+    """Return the directory of the self-contained artifact kept next to a model.pth checkpoint."""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + '_artifact')
+
+
+def save_artifact(model, tokenizer, directory, model_name, max_length=300, checkpoint_path=None,
+                  checkpoint_sha256=None):
+    """
+    Save a classifier as a directory that loads without the pretrained weights or the Hub.
+
+    The directory holds the BERT config, the tokenizer files, the weights as safetensors
+    (including the buffers that state_dict leaves out) and a metadata file. When the
+    artifact is made from a checkpoint, the checkpoint's size and modification time are
+    recorded, so is_current can tell when the checkpoint has been replaced.
+
+    Args:
+        model (BERTClassifier): The classifier.
+        tokenizer: Its tokenizer.
+        directory (str): Where to write the artifact.
+        model_name (str): Name of the pretrained BERT model the classifier was trained from.
+        max_length (int): Length texts are truncated to.
+        checkpoint_path (str): The model.pth the weights were loaded from, if any.
+        checkpoint_sha256 (str): Its hash, stored so loading does not need to rehash it.
+    """
+    from safetensors.torch import save_file
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    model.bert.config.save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+
+    tensors = {**model.state_dict(), **dict(model.named_buffers())}
+    save_file({name: tensor.detach().cpu().contiguous() for name, tensor in tensors.items()},
+              str(directory / WEIGHTS_FILE))
+
+    metadata = {
+        "version": ARTIFACT_VERSION,
+        "model_name": model_name,
+        "num_classes": model.fc.out_features,
+        "max_length": max_length,
+        "checkpoint": _checkpoint_stat(checkpoint_path) if checkpoint_path else None,
+        "checkpoint_sha256": checkpoint_sha256,
+    }
+    with open(directory / METADATA_FILE, 'w', encoding='utf-8') as file:
+        json.dump(metadata, file, indent=4)
+
+
+def is_current(directory, checkpoint_path):
+    """Return whether an artifact exists and was made from the checkpoint as it is now."""
+    metadata = read_metadata(directory)
+    return (metadata is not None and metadata.get("version") == ARTIFACT_VERSION
+            and os.path.exists(checkpoint_path) and metadata.get("checkpoint") == _checkpoint_stat(checkpoint_path))
+
+
+def read_metadata(directory):
+    try:
+        with open(Path(directory) / METADATA_FILE, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def load_artifact(directory, device='cpu'):
+    """
+    Load a classifier saved by save_artifact.
+
+    The architecture is built on the meta device, so no time is spent on random
+    initialization, and the memory-mapped safetensors are then assigned as its weights.
+
+    Returns:
+        tuple: (model, tokenizer, metadata).
+    """
+    from safetensors.torch import load_file
+
+    directory = Path(directory)
+    metadata = read_metadata(directory)
+    if metadata is None:
+        raise FileNotFoundError(f"No classifier artifact found at: {directory}")
+
+    config = BertConfig.from_pretrained(directory)
+    with torch.device('meta'):
+        model = BERTClassifier(metadata["model_name"], metadata["num_classes"], device='meta', pretrained=False,
+                               config=config)
+
+    tensors = load_file(str(directory / WEIGHTS_FILE), device=str(torch.device(device)))
+    state_dict = model.state_dict()
+    model.load_state_dict({name: tensors[name] for name in state_dict}, assign=True)
+    # Buffers outside the state dict, such as the position ids
+    for name, _ in list(model.named_buffers()):
+        if name not in state_dict:
+            module_name, _, buffer_name = name.rpartition('.')
+            model.get_submodule(module_name)._buffers[buffer_name] = tensors[name]
+
+    model.device = torch.device(device)
+    model.eval()
+
+    tokenizer = BertTokenizerFast.from_pretrained(directory)
+    return model, tokenizer, metadata
+
+
+def _checkpoint_stat(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
@@ -0,0 +1,99 @@
+import random
+
+import torch
+from torch.utils.data import Sampler
+
+
+def length_sorted_batches(lengths, batch_size):
+    """
+    Group sample indices into batches of similar length.
+
+    Indices are sorted by length and cut into consecutive batches, so each batch only needs
+    padding up to its own longest sequence. Callers map results back through the indices to
+    restore the original order.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def pad_batch(sequences, pad_token_id=0):
+    """Pad token id sequences to the longest one and return (input_ids, attention_mask) tensors."""
+    longest = max((len(sequence) for sequence in sequences), default=0)
+    input_ids = torch.full((len(sequences), longest), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), longest), dtype=torch.long)
+
+    for row, sequence in enumerate(sequences):
+        input_ids[row, :len(sequence)] = torch.as_tensor(sequence, dtype=torch.long)
+        attention_mask[row, :len(sequence)] = 1
+
+    return input_ids, attention_mask
+
+
+class BucketBatchSampler(Sampler):
+    """
+    Batch sampler that batches samples of similar length while keeping training order random.
+
+    Every epoch the indices are shuffled and cut into buckets of batch_size * bucket_batches
+    samples. Each bucket is sorted by length and cut into batches, and the batches of all
+    buckets are shuffled together, so batches need little padding but their order, and which
+    samples share a bucket, changes from epoch to epoch.
+
+    Args:
+        lengths (list): Token length of each sample.
+        batch_size (int): Samples per batch.
+        bucket_batches (int): Batches per bucket. Larger buckets pad less but shuffle less.
+        shuffle (bool): Shuffle samples and batches. Without it, batches are length-sorted once.
+        drop_last (bool): Drop the last batch of each bucket if it is smaller than batch_size.
+        seed (int): Seed of the shuffling; the epoch number set by set_epoch is added to it. By
+            default each epoch draws a seed from torch's generator, as DataLoader(shuffle=True)
+            does, so the order changes between runs unless torch.manual_seed is set.
+    """
+
+    def __init__(self, lengths, batch_size, bucket_batches=50, shuffle=True, drop_last=False, seed=None):
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = batch_size * bucket_batches
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Set the epoch, which reseeds the shuffling of a sampler with a fixed seed."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        if not self.shuffle:
+            batches = length_sorted_batches(self.lengths, self.batch_size)
+            if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+                batches.pop()
+            yield from batches
+            return
+
+        if self.seed is None:
+            rng = random.Random(int(torch.empty((), dtype=torch.int64).random_().item()))
+        else:
+            rng = random.Random(self.seed + self.epoch)
+        indices = list(range(len(self.lengths)))
+        rng.shuffle(indices)
+
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = sorted(indices[start:start + self.bucket_size], key=self.lengths.__getitem__)
+            for i in range(0, len(bucket), self.batch_size):
+                batch = bucket[i:i + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch)
+        rng.shuffle(batches)
+        yield from batches
+
+    def __len__(self):
+        if not self.shuffle:
+            count = len(self.lengths)
+            return count // self.batch_size if self.drop_last else -(-count // self.batch_size)
+
+        full_buckets, remainder = divmod(len(self.lengths), self.bucket_size)
+        per_bucket = self.bucket_size // self.batch_size
+        if self.drop_last:
+            return full_buckets * per_bucket + remainder // self.batch_size
+        return full_buckets * per_bucket + -(-remainder // self.batch_size)
@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+
+import torch
+import torch.multiprocessing as mp
+
+from .bucketing import length_sorted_batches, pad_batch
+
+# Seconds between checks that the replicas are still alive while waiting on a queue
+POLL_SECONDS = 1.0
+
+
+def available_cores():
+    """Return the sorted list of CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_sets(replicas, threads_per_replica=None, cores=None):
+    """
+    Split the available cores into one contiguous set per replica.
+
+    Without threads_per_replica, the cores are divided evenly between the replicas. When more
+    threads are asked for than there are cores, the sets wrap around and share cores.
+    """
+    cores = cores if cores is not None else available_cores()
+    threads = threads_per_replica or max(1, len(cores) // replicas)
+    return [[cores[(replica * threads + i) % len(cores)] for i in range(threads)] for replica in range(replicas)]
+
+
+class CpuInferenceEngine:
+    """
+    Run model replicas in separate processes, each pinned to its own cores, and feed them batches.
+
+    The model's weights are moved to shared memory once and shared by every replica rather
+    than copied. Each replica pins itself to its core set and sets torch.set_num_threads to
+    its size, so replicas do not compete for cores the way one process with a large thread
+    pool and Python-level batching does. A feeder thread pads length-bucketed batches and
+    passes them to the replicas through torch.multiprocessing queues, which move the tensors
+    through shared memory. The task queue is bounded, so at most a few batches wait per replica.
+
+    Args:
+        model (nn.Module): The classifier, on the CPU.
+        replicas (int): Number of replica processes.
+        threads_per_replica (int): Intra-op threads (and pinned cores) per replica. Defaults to
+            the available cores divided between the replicas.
+        pad_token_id (int): Id used to pad batches.
+        batch_size (int): Sequences per batch sent to a replica.
+    """
+
+    def __init__(self, model, replicas, threads_per_replica=None, pad_token_id=0, batch_size=32):
+        self.replicas = replicas
+        self.pad_token_id = pad_token_id
+        self.batch_size = batch_size
+        self.core_sets = plan_core_sets(replicas, threads_per_replica)
+        self._call_id = 0
+
+        model.to('cpu')
+        model.device = torch.device('cpu')
+        model.eval()
+        model.share_memory()
+
+        context = mp.get_context('spawn')
+        self._tasks = context.Queue(maxsize=2 * replicas)
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_replica_main, args=(model, cores, self._tasks, self._results), daemon=True)
+            for cores in self.core_sets
+        ]
+        for process in self._processes:
+            process.start()
+
+    def predict_token_ids(self, input_ids):
+        """
+        Classify tokenized sequences across the replicas and return the predictions in order.
+
+        Tasks and results carry the id of the call they belong to, so results left over from
+        a call that failed are discarded rather than read as this call's. Raises RuntimeError
+        when a replica fails on a batch or exits.
+        """
+        self._check_alive()
+        self._call_id += 1
+        call_id = self._call_id
+        batches = length_sorted_batches([len(ids) for ids in input_ids], self.batch_size)
+        stop = threading.Event()
+        feeder = threading.Thread(target=self._feed, args=(call_id, input_ids, batches, stop), daemon=True)
+        feeder.start()
+
+        predictions = [None] * len(input_ids)
+        remaining = len(batches)
+        try:
+            while remaining:
+                try:
+                    result_call_id, batch_number, batch_predictions = self._results.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    self._check_alive()
+                    continue
+                if result_call_id != call_id:
+                    continue
+                if isinstance(batch_predictions, str):
+                    raise RuntimeError(f"Inference replica failed: {batch_predictions}")
+                for i, prediction in zip(batches[batch_number], batch_predictions):
+                    predictions[i] = prediction
+                remaining -= 1
+        finally:
+            stop.set()
+            feeder.join()
+            if remaining:
+                self._drain_tasks()
+
+        return predictions
+
+    def close(self):
+        for process in self._processes:
+            if process.is_alive():
+                try:
+                    self._tasks.put(None, timeout=POLL_SECONDS)
+                except queue.Full:
+                    process.terminate()
+        for process in self._processes:
+            process.join(timeout=10 * POLL_SECONDS)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _feed(self, call_id, input_ids, batches, stop):
+        for batch_number, batch in enumerate(batches):
+            batch_ids, attention_mask = pad_batch([input_ids[i] for i in batch], self.pad_token_id)
+            task = (call_id, batch_number, batch_ids, attention_mask)
+            while True:
+                if stop.is_set():
+                    return
+                try:
+                    self._tasks.put(task, timeout=POLL_SECONDS)
+                    break
+                except queue.Full:
+                    pass
+
+    def _drain_tasks(self):
+        """Drop the batches of a failed call that no replica has taken yet."""
+        try:
+            while True:
+                self._tasks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _check_alive(self):
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(f"Inference replica {process.pid} exited with code {process.exitcode}.")
+
+
+def _replica_main(model, cores, tasks, results):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    with torch.inference_mode():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            call_id, batch_number, input_ids, attention_mask = task
+            try:
+                outputs = model(input_ids=input_ids, attention_mask=attention_mask)
+                results.put((call_id, batch_number, outputs.argmax(dim=1).tolist()))
+            except Exception as e:
+                results.put((call_id, batch_number, repr(e)))
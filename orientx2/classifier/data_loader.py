@@ -1,8 +1,11 @@
 import torch
 import csv
+import numpy as np
 from sklearn.model_selection import train_test_split
 from torch.utils.data import Dataset
 
+from .bucketing import pad_batch
+
 
 def load_data(filepath, test_size=0.15, shuffle=True):
     texts, labels = [], []
@@ -54,3 +57,60 @@ class TextClassificationDataset(Dataset):
             'attention_mask': encoding['attention_mask'].flatten(),
             'label': torch.tensor(label, dtype=torch.long)
         }
+
+
+class PreTokenizedDataset(Dataset):
+    """
+    Dataset that tokenizes every text once, up front, with the fast batch tokenizer.
+
+    Token ids are stored unpadded in one flat array (uint16 when the vocabulary fits, int32
+    otherwise) with an offset per text, so epochs after the first cost no tokenization and
+    memory holds only real tokens. Use with PadCollator to pad each batch to its longest text,
+    and with BucketBatchSampler to batch texts of similar length together. With a TokenCache,
+    texts tokenized by an earlier run are read from the cache instead.
+    """
+
+    def __init__(self, texts, labels, tokenizer, max_length, tokenize_batch_size=1024, token_cache=None):
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.pad_token_id = tokenizer.pad_token_id
+
+        dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max + 1 else np.int32
+        chunks, lengths = [], []
+        if token_cache is not None:
+            encoded = [token_cache.encode(texts, tokenize_batch_size)]
+        else:
+            encoded = (tokenizer(list(texts[i:i + tokenize_batch_size]), max_length=max_length,
+                                 truncation=True)['input_ids'] for i in range(0, len(texts), tokenize_batch_size))
+        for batch in encoded:
+            for ids in batch:
+                chunks.append(np.asarray(ids, dtype=dtype))
+                lengths.append(len(ids))
+
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)))
+        self.token_ids = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx):
+        ids = self.token_ids[self.offsets[idx]:self.offsets[idx + 1]]
+        return {
+            'input_ids': torch.from_numpy(ids.astype(np.int64)),
+            'label': torch.tensor(self.labels[idx], dtype=torch.long)
+        }
+
+
+class PadCollator:
+    """Collate PreTokenizedDataset samples, padding input_ids to the longest one in the batch."""
+
+    def __init__(self, pad_token_id=0):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, samples):
+        input_ids, attention_mask = pad_batch([sample['input_ids'] for sample in samples], self.pad_token_id)
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'label': torch.stack([sample['label'] for sample in samples])
+        }
@@ -0,0 +1,196 @@
+import copy
+import time
+import weakref
+
+import numpy as np
+import torch
+from torch import nn
+
+from .model import BERTClassifier
+
+# Inference backends selectable in predict_sentiment
+BACKENDS = ("fp32", "int8", "onnx")
+
+ONNX_OPSET = 17
+
+# Quantized copies of fp32 models and ONNX Runtime sessions, built once per model or path
+_quantized_models = weakref.WeakKeyDictionary()
+_onnx_sessions = {}
+
+
+def quantize_model(model):
+    """
+    Return a copy of a classifier with its Linear layers dynamically quantized to int8.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up the
+    matrix multiplications that dominate BERT on CPU. Quantized models only run on the CPU.
+    The model passed in is left as it is, on its own device.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    model = copy.deepcopy(model).to('cpu').eval()
+    model.device = torch.device('cpu')
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(model, path):
+    """Save a model returned by quantize_model."""
+    torch.save(model.state_dict(), path)
+
+
+def load_quantized(path, model_name="bert-base-uncased", num_classes=3, config=None):
+    """
+    Load a model saved by save_quantized.
+
+    Only the BERT config is needed to build the model, not the pretrained weights; pass
+    config (e.g. BertConfig.from_pretrained of a model artifact) to avoid the Hub entirely.
+    The packed int8 weights are not plain tensors, so the file is unpickled in full: only
+    load files you trust.
+    """
+    model = quantize_model(BERTClassifier(model_name, num_classes, device='cpu', pretrained=False, config=config))
+    model.load_state_dict(torch.load(path, weights_only=False))
+    return model
+
+
+def use_quantized(model, path):
+    """
+    Make the 'int8' backend of model run the quantized model saved at path by save_quantized,
+    rather than quantizing model on first use. The file must have been made from model's weights.
+    """
+    _quantized_models[model] = load_quantized(path, num_classes=model.fc.out_features, config=model.bert.config)
+
+
+def export_onnx(model, path, opset_version=ONNX_OPSET):
+    """
+    Export a classifier to an ONNX graph with dynamic batch and sequence dimensions.
+
+    The graph takes int64 'input_ids' and 'attention_mask' and returns the 'logits'.
+    """
+    _require_onnx()
+    model = model.to('cpu').eval()
+    model.device = torch.device('cpu')
+
+    input_ids = torch.ones((2, 16), dtype=torch.long)
+    attention_mask = torch.ones((2, 16), dtype=torch.long)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in ('input_ids', 'attention_mask')}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    torch.onnx.export(
+        model, (input_ids, attention_mask), path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['logits'],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset_version,
+        external_data=False,
+    )
+
+
+class OnnxClassifier:
+    """
+    Run an ONNX graph written by export_onnx with ONNX Runtime on the CPU.
+
+    It is called like BERTClassifier and returns a logits tensor, so predict_sentiment and
+    predict_bucketed can use it in place of the PyTorch model.
+
+    Args:
+        path (str): Path to the .onnx file.
+        threads (int): Intra-op threads; ONNX Runtime's default when None.
+    """
+
+    def __init__(self, path, threads=None):
+        _require_onnxruntime()
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, input_ids, attention_mask):
+        (logits,) = self.session.run(['logits'], {
+            'input_ids': np.asarray(input_ids.cpu(), dtype=np.int64),
+            'attention_mask': np.asarray(attention_mask.cpu(), dtype=np.int64),
+        })
+        return torch.from_numpy(logits)
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+
+def select_backend(model, device, backend="fp32", onnx_path=None):
+    """
+    Return the (model, device) to run a backend with.
+
+    'fp32' returns the model and device unchanged. 'int8' returns a quantized copy of the
+    model (or the one set by use_quantized), and 'onnx' an OnnxClassifier for the graph at
+    onnx_path; both run on the CPU and are built on first use and reused afterwards.
+    """
+    if backend == "fp32":
+        return model, device
+    if backend == "int8":
+        if model not in _quantized_models:
+            _quantized_models[model] = quantize_model(model)
+        return _quantized_models[model], torch.device('cpu')
+    if backend == "onnx":
+        if onnx_path is None:
+            raise ValueError("The 'onnx' backend needs the path of an exported ONNX graph.")
+        if onnx_path not in _onnx_sessions:
+            _onnx_sessions[onnx_path] = OnnxClassifier(onnx_path)
+        return _onnx_sessions[onnx_path], torch.device('cpu')
+    raise ValueError(f"Unknown backend '{backend}'. Please choose one of {BACKENDS}.")
+
+
+def agreement_report(texts, labels, models, tokenizer, reference="fp32", batch_size=32):
+    """
+    Compare the predictions of several backends of the same classifier on a labelled set.
+
+    Args:
+        texts (list): Validation texts.
+        labels (list): Their true labels.
+        models (dict): {backend name: model}, including the reference backend.
+        tokenizer: The tokenizer of the models.
+        reference (str): Backend the others are compared with.
+        batch_size (int): Texts per batch.
+
+    Returns:
+        dict: {backend name: {'accuracy', 'agreement', 'posts_per_sec'}}, where agreement is the
+        share of texts with the same prediction as the reference backend.
+    """
+    from sklearn.metrics import accuracy_score
+
+    from .predictor import predict_bucketed
+
+    predictions, report = {}, {}
+    for name, model in models.items():
+        start = time.perf_counter()
+        predictions[name] = predict_bucketed(texts, model, tokenizer, torch.device('cpu'), batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        report[name] = {
+            'accuracy': accuracy_score(labels, predictions[name]),
+            'posts_per_sec': len(texts) / elapsed if elapsed > 0 else float('inf'),
+        }
+
+    for name in models:
+        same = sum(a == b for a, b in zip(predictions[name], predictions[reference]))
+        report[name]['agreement'] = same / len(texts) if texts else 1.0
+    return report
+
+
+def _require_onnx():
+    try:
+        import onnx  # noqa: F401
+    except ImportError as e:
+        raise ImportError("ONNX export requires onnx and onnxscript. "
+                          "Install them with 'pip install onnx onnxscript'.") from e
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The ONNX backend requires onnxruntime. Install it with 'pip install onnxruntime'.") from e
@@ -1,14 +1,38 @@
+import argparse
+import asyncio
 import sys
 import os
 import time
-import pandas as pd
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed  # Use threads for better GPU utilization
-from orientx2.classifier import ClassificationPipeline, load_data, predict_sentiment
+from orientx2.classifier import ClassificationPipeline, load_data, predict_bucketed, predict_sentiment
+from orientx2.classifier.artifact import artifact_dir_for, is_current
+from orientx2.classifier.cpu_engine import CpuInferenceEngine
+from orientx2.classifier.export import (BACKENDS, OnnxClassifier, agreement_report, export_onnx, quantize_model,
+                                       save_quantized, use_quantized)
+from orientx2.classifier.prediction_cache import PredictionCache, checkpoint_sha256, classify_unique
+from orientx2.classifier.server import MAX_BATCH_SIZE, MAX_QUEUE, MAX_WAIT_MS, MicroBatcher, serve
+from orientx2.classifier.streaming import BATCH_ROWS, classify_posts_streaming
+from orientx2.classifier.trainer import PRECISIONS
+from orientx2.storage import FORMATS, count_posts, with_format_suffix
 import torch
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Posts per model forward pass when bucketing by length
+INFERENCE_BATCH_SIZE = 32
+
+PADDING_MODES = ('dynamic', 'max_length')
+
+# Directory of the token cache shared by training and inference, under assets/
+TOKEN_CACHE_DIR = 'token_cache'
+
+# Labels of already classified texts, per model checkpoint, under assets/
+PREDICTION_CACHE_PATH = 'prediction_cache.sqlite'
+
+# Models written by the export command, under assets/
+QUANTIZED_MODEL_PATH = 'model_int8.pth'
+ONNX_MODEL_PATH = 'model.onnx'
+
 
 def get_relative_path(*path_parts):
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,125 +40,168 @@ def get_relative_path(*path_parts):
     return os.path.join(project_root, *path_parts)
 
 
-def classify_batch(posts, pipeline):
+def classify_batch(posts, pipeline, padding='dynamic', prediction_cache=None, engine=None, backend='fp32'):
+    """
+    Classify a batch of posts, bucketing them by length unless padding is 'max_length'.
+
+    Each distinct text is classified once, and texts labelled by an earlier batch or run
+    with the same checkpoint are taken from the prediction cache. With a CpuInferenceEngine,
+    the posts are tokenized here and classified by the engine's replicas. backend selects the
+    fp32, int8 or ONNX model (see predict_sentiment).
+    """
+    onnx_path = get_relative_path('assets', ONNX_MODEL_PATH)
+
+    def classify(texts):
+        if engine is not None:
+            if pipeline.token_cache is not None:
+                input_ids = pipeline.token_cache.encode(texts)
+            else:
+                input_ids = pipeline.tokenizer(texts, max_length=pipeline.max_length, truncation=True)['input_ids']
+            return engine.predict_token_ids(input_ids)
+        if padding == 'max_length':
+            return predict_sentiment(texts, pipeline.model, pipeline.tokenizer, pipeline.device,
+                                     padding='max_length', backend=backend, onnx_path=onnx_path)
+        return predict_bucketed(texts, pipeline.model, pipeline.tokenizer, pipeline.device,
+                                batch_size=INFERENCE_BATCH_SIZE, token_cache=pipeline.token_cache,
+                                backend=backend, onnx_path=onnx_path)
+
     try:
         content_batch = [post['content'] for post in posts]
-        return predict_sentiment(content_batch, pipeline.model, pipeline.tokenizer, pipeline.device)
+        lowercase = getattr(pipeline.tokenizer, 'do_lower_case', False)
+        return classify_unique(content_batch, classify, prediction_cache, lowercase)
     except Exception as e:
         logging.error("Error during batch classification: %s", e)
         return [None] * len(posts)
 
 
-def append_to_csv(df, path, header=False):
-    """Append DataFrame to CSV."""
-    try:
-        # If file doesn't exist, write header
-        if os.path.exists(path) and not header:
-            df.to_csv(path, mode='a', header=False, index=False)
-        else:
-            df.to_csv(path, mode='a', header=True, index=False)
-    except Exception as e:
-        logging.error("Failed to append to CSV: %s", e)
+def load_pipeline(model_path, token_cache_dir=None):
+    """
+    Load the trained classifier for inference.
 
+    The self-contained artifact next to model.pth is used when it matches the checkpoint,
+    which skips reading the pretrained BERT weights before the checkpoint overwrites them.
+    Otherwise the checkpoint is loaded the slow way and the artifact is written for next time.
+    """
+    artifact_dir = artifact_dir_for(model_path)
+    if is_current(artifact_dir, model_path):
+        return ClassificationPipeline.from_artifact(artifact_dir, token_cache_dir=token_cache_dir)
 
-def clear_classified_tweets(classified_tweets_path):
-    """Delete the contents of the classified tweets file before appending new data."""
+    pipeline = ClassificationPipeline(model_name='bert-base-uncased', token_cache_dir=token_cache_dir)
+    pipeline.load_model(model_path)
     try:
-        if os.path.exists(classified_tweets_path):
-            os.remove(classified_tweets_path)
-            logging.info("Deleted existing classified tweets file.")
-        else:
-            logging.info("No existing classified tweets file found.")
+        pipeline.save_artifact(artifact_dir, model_path)
+        logging.info("Saved a fast-loading copy of the model to %s", artifact_dir)
     except Exception as e:
-        logging.error("Failed to delete classified tweets file: %s", e)
+        logging.warning("Failed to save the model artifact to %s: %s", artifact_dir, e)
+    return pipeline
 
 
-def classify_batch(posts, pipeline):
-    try:
-        content_batch = [post['content'] for post in posts]
-        return predict_sentiment(content_batch, pipeline.model, pipeline.tokenizer, pipeline.device)
-    except Exception as e:
-        logging.error("Error during batch classification: %s", e)
-        return [None] * len(posts)
+def load_exported_int8(pipeline, model_path):
+    """
+    Run the 'int8' backend with the model written by export, if it was made from the current model.pth.
+
+    Otherwise the model is quantized on first use, as before any export.
+    """
+    quantized_path = get_relative_path('assets', QUANTIZED_MODEL_PATH)
+    if not os.path.exists(quantized_path) or os.path.getmtime(quantized_path) < os.path.getmtime(model_path):
+        logging.info("No int8 model exported from %s; quantizing it on the fly.", model_path)
+        return
+    use_quantized(pipeline.model, quantized_path)
+    logging.info("Loaded the int8 model from %s", quantized_path)
 
 
-def inference():
+def inference(format='csv', padding='dynamic', token_cache=True, prediction_cache=True, replicas=1,
+              threads_per_replica=None, backend='fp32'):
     start_time = time.time()
 
     model_path = get_relative_path('assets', 'model.pth')
-    parsed_posts_path = get_relative_path('assets', 'parsed_posts.csv')
-    classified_tweets_path = get_relative_path('assets', 'classified_posts_for_stats.csv')
-
-    # Clear existing classified tweets file
-    clear_classified_tweets(classified_tweets_path)
+    parsed_posts_path = with_format_suffix(get_relative_path('assets', 'parsed_posts'), format)
+    classified_tweets_path = with_format_suffix(get_relative_path('assets', 'classified_posts_for_stats'), format)
+    token_cache_dir = get_relative_path('assets', TOKEN_CACHE_DIR) if token_cache else None
 
     # Load model
     try:
         logging.info("Loading model from %s", model_path)
-        pipeline = ClassificationPipeline(model_name='bert-base-uncased')
-        pipeline.load_model(model_path)
-        pipeline.model = pipeline.model.to('cuda' if torch.cuda.is_available() else 'cpu')
+        pipeline = load_pipeline(model_path, token_cache_dir)
+        if backend == 'int8':
+            load_exported_int8(pipeline, model_path)
         logging.info("Model loaded successfully.")
+        # Labels depend on the backend as well as the weights
+        model_hash = pipeline.checkpoint_sha256 or checkpoint_sha256(model_path)
+        model_hash += '' if backend == 'fp32' else f':{backend}'
+        if prediction_cache:
+            prediction_cache = PredictionCache(get_relative_path('assets', PREDICTION_CACHE_PATH), model_hash)
+        else:
+            prediction_cache = None
     except Exception as e:
         logging.error("Failed to load model from %s: %s", model_path, e)
         return
 
-    # Load parsed posts
     try:
-        logging.info("Reading parsed posts from %s", parsed_posts_path)
-        parsed_posts_df = pd.read_csv(parsed_posts_path)
-        logging.info("Parsed posts loaded successfully.")
+        total_rows = count_posts(parsed_posts_path)
     except Exception as e:
         logging.error("Failed to read parsed posts from %s: %s", parsed_posts_path, e)
         return
 
-    total_rows = parsed_posts_df.shape[0]
-    batch_size = 256
-    classifications = [None] * total_rows
-
-    logging.info("Classifying %d posts", total_rows)
-
-    # Store all classified posts here
-    all_classified_posts = []
-
-    # Process batches sequentially
-    for i in range(0, total_rows, batch_size):
-        batch = parsed_posts_df.iloc[i:i + batch_size]
-        batch_classifications = classify_batch(batch.to_dict('records'), pipeline)
-        start_index = i
-        end_index = start_index + len(batch_classifications)
-        classifications[start_index:end_index] = batch_classifications
-
-        batch_df = batch.copy()
-        batch_df['orientation'] = batch_classifications
-        all_classified_posts.append(batch_df)
-
+    logging.info("Classifying %d posts from %s", total_rows, parsed_posts_path)
+
+    engine = None
+    batch_rows = BATCH_ROWS
+    if replicas > 1 and (pipeline.device.type != 'cpu' or padding == 'max_length' or backend != 'fp32'):
+        logging.warning("Model replicas are only used for fp32 CPU inference with dynamic padding; "
+                        "using one process.")
+    elif replicas > 1:
+        engine = CpuInferenceEngine(pipeline.model, replicas, threads_per_replica, pipeline.tokenizer.pad_token_id,
+                                    INFERENCE_BATCH_SIZE)
+        logging.info("Started %d inference replicas on cores %s", replicas, engine.core_sets)
+        # Give every replica several batches from each read of the input
+        batch_rows = max(BATCH_ROWS, 4 * replicas * INFERENCE_BATCH_SIZE)
+    elif threads_per_replica:
+        torch.set_num_threads(threads_per_replica)
+
+    def log_progress(rows_done, rows_classified):
         elapsed_time = time.time() - start_time
-        rows_processed = end_index
-        speed = rows_processed / elapsed_time if elapsed_time > 0 else 0
-        remaining_rows = total_rows - rows_processed
+        speed = rows_classified / elapsed_time if elapsed_time > 0 else 0
+        remaining_rows = total_rows - rows_done
         estimated_time_remaining = remaining_rows / speed if speed > 0 else 0
         estimated_time_remaining /= (60 * 60)
 
-        percent_done = (rows_processed / total_rows) * 100
+        percent_done = (rows_done / total_rows) * 100 if total_rows else 100
         logging.error(f"Progress: {percent_done:.2f}% | Speed: {speed:.2f} rows/sec | "
                      f"Estimated Time Remaining: {estimated_time_remaining:.2f} hours")
 
-    # Once classification is done, write everything to CSV at once
-    all_classified_posts_df = pd.concat(all_classified_posts, ignore_index=True)
-    append_to_csv(all_classified_posts_df, classified_tweets_path, header=True)
-
-    parsed_posts_df['orientation'] = classifications
+    # Classified batches are written as they finish, and an interrupted run resumes where it stopped
+    try:
+        classify_posts_streaming(
+            parsed_posts_path, classified_tweets_path,
+            lambda batch: classify_batch(batch.to_dict('records'), pipeline, padding, prediction_cache, engine,
+                                         backend),
+            fingerprint={"model_sha256": model_hash},
+            batch_rows=batch_rows,
+            on_progress=log_progress,
+        )
+    except RuntimeError as e:
+        logging.error("%s", e)
+    finally:
+        if engine is not None:
+            engine.close()
+
+    if pipeline.token_cache is not None:
+        logging.info("Token cache: %d hits, %d misses", pipeline.token_cache.hits, pipeline.token_cache.misses)
+    if prediction_cache is not None:
+        logging.info("Prediction cache: %d distinct texts reused, %d classified",
+                     prediction_cache.hits, prediction_cache.misses)
+        prediction_cache.close()
 
-    # Final save after all classification
     elapsed_time = time.time() - start_time
     logging.error("Classification completed in %.2f seconds.", elapsed_time)
 
 
 
-def train():
+def train(token_cache=True, effective_batch_size=None, precision='fp32', num_workers=0):
     training_dataset_path = get_relative_path('assets', 'td_testing.csv')
     model_path = get_relative_path('assets', 'model.pth')
+    token_cache_dir = get_relative_path('assets', TOKEN_CACHE_DIR) if token_cache else None
 
     # Load training data
     try:
@@ -145,7 +212,9 @@ def train():
         logging.error("Failed to load training data from %s: %s", training_dataset_path, e)
         return
 
-    pipeline = ClassificationPipeline(model_name='bert-base-uncased')
+    pipeline = ClassificationPipeline(model_name='bert-base-uncased', token_cache_dir=token_cache_dir,
+                                      effective_batch_size=effective_batch_size, precision=precision,
+                                      num_workers=num_workers)
 
     logging.info("Preparing data")
     try:
@@ -164,19 +233,134 @@ def train():
         logging.error("Failed to train model: %s", e)
 
 
-def main():
-    if len(sys.argv) != 2:
-        logging.error("Please specify the mode: 'train' or 'inference'")
-        sys.exit(1)
+def export():
+    """Write int8-quantized and ONNX versions of model.pth and compare their predictions with it."""
+    training_dataset_path = get_relative_path('assets', 'td_testing.csv')
+    model_path = get_relative_path('assets', 'model.pth')
 
-    mode = sys.argv[1].lower()
+    try:
+        logging.info("Loading model from %s", model_path)
+        pipeline = load_pipeline(model_path)
+        model = pipeline.model.to('cpu')
+        model.device = torch.device('cpu')
+    except Exception as e:
+        logging.error("Failed to load model from %s: %s", model_path, e)
+        return
+
+    models = {'fp32': model}
+
+    quantized_path = get_relative_path('assets', QUANTIZED_MODEL_PATH)
+    models['int8'] = quantize_model(model)
+    save_quantized(models['int8'], quantized_path)
+    logging.info("Saved the int8 model to %s", quantized_path)
+
+    onnx_path = get_relative_path('assets', ONNX_MODEL_PATH)
+    try:
+        export_onnx(model, onnx_path)
+        models['onnx'] = OnnxClassifier(onnx_path)
+        logging.info("Saved the ONNX model to %s", onnx_path)
+    except ImportError as e:
+        logging.error("Skipping the ONNX export: %s", e)
+
+    # Compare the backends on the same validation split as training
+    try:
+        _, (val_texts, val_labels) = load_data(training_dataset_path)
+    except Exception as e:
+        logging.error("Failed to load validation data from %s: %s", training_dataset_path, e)
+        return
+
+    report = agreement_report(val_texts, val_labels, models, pipeline.tokenizer, batch_size=INFERENCE_BATCH_SIZE)
+    logging.info("Agreement with fp32 on %d validation posts:", len(val_texts))
+    for name, scores in report.items():
+        logging.info("  %-5s accuracy %.4f | agreement %.4f | %.1f posts/sec",
+                     name, scores['accuracy'], scores['agreement'], scores['posts_per_sec'])
+
+
+def run_server(host='127.0.0.1', port=8080, unix_socket=None, max_batch_size=MAX_BATCH_SIZE,
+               max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE, backend='fp32'):
+    """Serve the classifier over HTTP, classifying concurrent requests in micro-batches."""
+    model_path = get_relative_path('assets', 'model.pth')
+    onnx_path = get_relative_path('assets', ONNX_MODEL_PATH)
+
+    try:
+        logging.info("Loading model from %s", model_path)
+        pipeline = load_pipeline(model_path)
+        if backend == 'int8':
+            load_exported_int8(pipeline, model_path)
+        logging.info("Model loaded successfully.")
+    except Exception as e:
+        logging.error("Failed to load model from %s: %s", model_path, e)
+        return
+
+    lowercase = getattr(pipeline.tokenizer, 'do_lower_case', False)
+
+    def classify(texts):
+        return classify_unique(texts, lambda unique: predict_bucketed(
+            unique, pipeline.model, pipeline.tokenizer, pipeline.device, batch_size=INFERENCE_BATCH_SIZE,
+            backend=backend, onnx_path=onnx_path), lowercase=lowercase)
+
+    batcher = MicroBatcher(classify, max_batch_size, max_wait_ms, max_queue)
+    try:
+        asyncio.run(serve(batcher, host, port, unix_socket))
+    except KeyboardInterrupt:
+        logging.info("Server stopped. Metrics: %s", batcher.metrics())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the orientation classifier or classify parsed posts.")
+    parser.add_argument('mode', type=str.lower, help="'train', 'inference', 'export' or 'serve'")
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="Format of the parsed and classified posts files (default: csv)")
+    parser.add_argument('--padding', choices=PADDING_MODES, default='dynamic',
+                        help="'dynamic' batches posts of similar length and pads each batch to its longest post; "
+                             "'max_length' pads every post to 300 tokens (default: dynamic)")
+    parser.add_argument('--no-token-cache', dest='token_cache', action='store_false',
+                        help=f"Tokenize every post instead of reusing token ids cached in assets/{TOKEN_CACHE_DIR}")
+    parser.add_argument('--replicas', type=int, default=1,
+                        help="Model replica processes for CPU inference, each pinned to its own cores (default: 1)")
+    parser.add_argument('--threads-per-replica', type=int, default=None,
+                        help="Intra-op threads per replica (default: available cores divided between the replicas)")
+    parser.add_argument('--no-prediction-cache', dest='prediction_cache', action='store_false',
+                        help="Classify every distinct post instead of reusing labels cached for the same model.pth "
+                             f"in assets/{PREDICTION_CACHE_PATH}")
+    parser.add_argument('--backend', choices=BACKENDS, default='fp32',
+                        help="Run the model as is ('fp32'), dynamically quantized ('int8'), or with ONNX Runtime "
+                             f"from assets/{ONNX_MODEL_PATH} written by the export mode ('onnx') (default: fp32)")
+    parser.add_argument('--effective-batch-size', type=int, default=None,
+                        help="Training samples per optimizer step, reached by gradient accumulation "
+                             "(default: the batch size of 4, without accumulation)")
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32',
+                        help="Training precision; 'auto' uses bf16 autocast on the CPU and AMP on a GPU (default: fp32)")
+    parser.add_argument('--num-workers', type=int, default=0,
+                        help="DataLoader worker processes for training (default: 0)")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to serve on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="Port to serve on (default: 8080)")
+    parser.add_argument('--unix-socket', default=None, help="Serve on this Unix socket instead of a TCP port")
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE,
+                        help=f"Most posts per micro-batch when serving (default: {MAX_BATCH_SIZE})")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help=f"Longest a post waits for its micro-batch to fill (default: {MAX_WAIT_MS})")
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE,
+                        help=f"Most queued posts before requests get 503 responses (default: {MAX_QUEUE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mode = args.mode
 
     if mode == "train":
-        train()
+        train(args.token_cache, args.effective_batch_size, args.precision, args.num_workers)
     elif mode == "inference":
-        inference()
+        inference(args.format, args.padding, args.token_cache, args.prediction_cache, args.replicas,
+                  args.threads_per_replica, args.backend)
+    elif mode == "export":
+        export()
+    elif mode == "serve":
+        run_server(args.host, args.port, args.unix_socket, args.max_batch_size, args.max_wait_ms, args.max_queue,
+                   args.backend)
     else:
-        logging.error("Invalid mode '%s'. Please choose either 'train' or 'inference'", mode)
+        logging.error("Invalid mode '%s'. Please choose either 'train', 'inference', 'export' or 'serve'", mode)
         sys.exit(1)
 
 
@@ -1,14 +1,17 @@
 import torch
 from torch import nn
-from transformers import BertModel
+from transformers import BertConfig, BertModel
 
 
 class BERTClassifier(nn.Module):
-    def __init__(self, bert_model_name, num_classes, device='cuda'):
+    def __init__(self, bert_model_name, num_classes, device='cuda', pretrained=True, config=None):
         super(BERTClassifier, self).__init__()
 
-        # Initialize BERT model
-        self.bert = BertModel.from_pretrained(bert_model_name)
+        # Initialize BERT model, or only its architecture when the weights come from a checkpoint
+        if pretrained:
+            self.bert = BertModel.from_pretrained(bert_model_name)
+        else:
+            self.bert = BertModel(config if config is not None else BertConfig.from_pretrained(bert_model_name))
 
         # Set the model to the specified device (GPU or CPU)
         self.device = device
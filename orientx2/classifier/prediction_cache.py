@@ -0,0 +1,121 @@
+import hashlib
+import os
+import sqlite3
+
+
+def checkpoint_sha256(path):
+    """Return the SHA-256 of a model checkpoint file, identifying the weights predictions came from."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dedup_key(text, lowercase=False):
+    """
+    Return the text that duplicates are detected by: whitespace collapsed, and lowercased for
+    uncased tokenizers. Texts with the same key tokenize to the same ids, so they get the same label.
+    """
+    text = ' '.join(text.split())
+    return text.lower() if lowercase else text
+
+
+class PredictionCache:
+    """
+    Persistent cache of predicted labels, keyed by (model checkpoint hash, text hash).
+
+    A rerun with the same checkpoint only classifies texts it has not seen; a retrained model
+    gets a new checkpoint hash and so never reuses the old model's labels.
+
+    Args:
+        path (str): Path of the SQLite database.
+        model_hash (str): Hash of the checkpoint the labels come from, e.g. from checkpoint_sha256.
+    """
+
+    def __init__(self, path, model_hash):
+        self.path = path
+        self.model_hash = model_hash
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                model_hash TEXT NOT NULL, text_hash BLOB NOT NULL, label INTEGER NOT NULL,
+                PRIMARY KEY (model_hash, text_hash)
+            ) WITHOUT ROWID
+        """)
+
+    def get_many(self, texts):
+        """Return {text: label} for the texts with a cached label."""
+        hashes = {_text_hash(text): text for text in texts}
+        found = {}
+        keys = list(hashes)
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT text_hash, label FROM predictions "
+                f"WHERE model_hash = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [self.model_hash, *batch]
+            )
+            for text_hash, label in rows:
+                found[hashes[text_hash]] = label
+        return found
+
+    def put_many(self, labels):
+        """Store {text: label}, skipping texts whose label is None (failed classifications)."""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+            [(self.model_hash, _text_hash(text), label) for text, label in labels.items() if label is not None]
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def classify_unique(texts, classify, cache=None, lowercase=False):
+    """
+    Classify each distinct text once and fan the labels back out to every text.
+
+    Texts are grouped by dedup_key. Groups with a label in the cache are not classified again;
+    the rest are passed to classify in one call, and their labels are added to the cache.
+
+    Args:
+        texts (list): The texts to label.
+        classify (callable): Maps a list of texts to a list of labels.
+        cache (PredictionCache): Optional cache of labels from earlier batches and runs.
+        lowercase (bool): Whether the model is uncased, so case does not distinguish texts.
+
+    Returns:
+        list: The label of each text, in order.
+    """
+    keys = [dedup_key(text, lowercase) for text in texts]
+    unique = list(dict.fromkeys(keys))
+
+    labels = cache.get_many(unique) if cache is not None else {}
+    missing = [key for key in unique if key not in labels]
+    if cache is not None:
+        cache.hits += len(unique) - len(missing)
+        cache.misses += len(missing)
+
+    if missing:
+        new_labels = dict(zip(missing, classify(missing)))
+        if cache is not None:
+            cache.put_many(new_labels)
+        labels.update(new_labels)
+
+    return [labels[key] for key in keys]
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
@@ -1,7 +1,18 @@
 import torch
 
+from .bucketing import length_sorted_batches, pad_batch
+from .export import select_backend
 
-def predict_sentiment(texts, model, tokenizer, device, max_length=300):
+
+def predict_sentiment(texts, model, tokenizer, device, max_length=300, padding='longest', backend='fp32',
+                      onnx_path=None):
+    """
+    Classify a batch of texts.
+
+    backend selects how the model is run: 'fp32' as is, 'int8' dynamically quantized, or
+    'onnx' with ONNX Runtime from the graph at onnx_path (see classifier.export).
+    """
+    model, device = select_backend(model, device, backend, onnx_path)
     model.to(device)  # Ensure the model is on the correct device
     model.eval()
 
@@ -11,7 +22,7 @@ def predict_sentiment(texts, model, tokenizer, device, max_length=300):
             texts,
             return_tensors='pt',
             max_length=max_length,
-            padding='max_length',
+            padding=padding,
             truncation=True
         )
     except Exception as e:
@@ -28,3 +39,39 @@ def predict_sentiment(texts, model, tokenizer, device, max_length=300):
 
     return predictions.cpu().tolist()  # Ensure predictions are moved to the CPU
 
+
+def predict_bucketed(texts, model, tokenizer, device, max_length=300, batch_size=32, token_cache=None,
+                     backend='fp32', onnx_path=None):
+    """
+    Classify texts in batches of similar token length, each padded only to its longest text.
+
+    The texts are tokenized once without padding, sorted by length and cut into batches, so
+    short posts are not padded out to max_length. Predictions are returned in the order of texts.
+    With a TokenCache (built for the same tokenizer and max_length), cached texts are not
+    tokenized again. backend is as for predict_sentiment.
+    """
+    model, device = select_backend(model, device, backend, onnx_path)
+    model.to(device)
+    model.eval()
+
+    if token_cache is not None:
+        input_ids = token_cache.encode(texts)
+    else:
+        input_ids = tokenizer(list(texts), max_length=max_length, truncation=True)['input_ids']
+    return predict_token_ids(input_ids, model, device, tokenizer.pad_token_id, batch_size)
+
+
+def predict_token_ids(input_ids, model, device, pad_token_id=0, batch_size=32):
+    """Classify already tokenized sequences with length bucketing; see predict_bucketed."""
+    predictions = [None] * len(input_ids)
+
+    with torch.no_grad():
+        for batch in length_sorted_batches([len(ids) for ids in input_ids], batch_size):
+            batch_ids, attention_mask = pad_batch([input_ids[i] for i in batch], pad_token_id)
+            outputs = model(input_ids=batch_ids.to(device), attention_mask=attention_mask.to(device))
+            _, batch_predictions = torch.max(outputs, dim=1)
+
+            for i, prediction in zip(batch, batch_predictions.cpu().tolist()):
+                predictions[i] = prediction
+
+    return predictions
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Default latency budget of a micro-batch
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 10
+
+# Texts allowed to wait for the model before requests are turned away
+MAX_QUEUE = 1024
+
+# Latencies kept for the percentiles reported by /metrics
+LATENCY_WINDOW = 10_000
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class QueueFull(Exception):
+    """Raised when the batcher's queue has no room for a request's texts."""
+
+
+class MicroBatcher:
+    """
+    Gather texts from concurrent requests into micro-batches for a synchronous classify function.
+
+    A batch is sent to the model as soon as it holds max_batch_size texts, or max_wait_ms after
+    its first text arrived, whichever comes first, so a lone request waits at most max_wait_ms
+    and a busy server fills whole batches. The model runs in a worker thread, leaving the
+    event loop free to accept requests meanwhile. At most max_queue texts wait at once;
+    beyond that, submit raises QueueFull rather than letting latency grow without bound.
+
+    Args:
+        classify (callable): Maps a list of texts to a list of labels.
+        max_batch_size (int): Most texts per batch.
+        max_wait_ms (float): Longest time the first text of a batch waits for more.
+        max_queue (int): Most texts waiting to be classified.
+    """
+
+    def __init__(self, classify, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self.classify = classify
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+
+        self.started = time.monotonic()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+        # Made in start(), inside the running loop: before Python 3.10 an asyncio.Queue binds to
+        # the loop current when it is created, which is not the one asyncio.run starts
+        self._queue = None
+        self._executor = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def submit(self, texts):
+        """Classify texts with the other pending requests and return their labels."""
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher.start() must be called before submit().")
+        if self._queue.qsize() + len(texts) > self.max_queue:
+            self.rejected += 1
+            raise QueueFull()
+
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._queue.put_nowait((text, future))
+            futures.append(future)
+
+        labels = await asyncio.gather(*futures)
+        self.latencies.append(time.monotonic() - start)
+        self.requests += 1
+        return labels
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        elapsed = time.monotonic() - self.started
+        return {
+            'requests': self.requests,
+            'texts': self.texts,
+            'batches': self.batches,
+            'rejected': self.rejected,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'mean_batch_size': self.texts / self.batches if self.batches else 0.0,
+            'throughput_texts_per_sec': self.texts / elapsed if elapsed > 0 else 0.0,
+            'latency_p50_ms': _percentile(latencies, 50) * 1000,
+            'latency_p99_ms': _percentile(latencies, 99) * 1000,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                labels = await loop.run_in_executor(self._executor, self.classify, texts)
+            except Exception as e:
+                logging.error("Error during batch classification: %s", e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(batch)
+            for (_, future), label in zip(batch, labels):
+                if not future.done():
+                    future.set_result(label)
+
+
+async def serve(batcher, host='127.0.0.1', port=8080, unix_socket=None):
+    """
+    Serve a MicroBatcher over HTTP/1.1 on a TCP port or a Unix socket until cancelled.
+
+    POST /classify with {"texts": [...]} returns {"labels": [...]}; the server answers 503
+    with a Retry-After header when the queue is full. GET /metrics returns the batcher's
+    metrics and GET /health returns {"status": "ok"}. Connections are kept alive.
+    """
+    async def handle(reader, writer):
+        try:
+            while await _handle_request(reader, writer, batcher):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    batcher.start()
+    if unix_socket:
+        server = await asyncio.start_unix_server(handle, path=unix_socket)
+        logging.info("Serving on unix socket %s", unix_socket)
+    else:
+        server = await asyncio.start_server(handle, host, port)
+        logging.info("Serving on http://%s:%d", host, port)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+async def _handle_request(reader, writer, batcher):
+    """Answer one request; return whether the connection stays open."""
+    request_line = await reader.readline()
+    if not request_line:
+        return False
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        await _respond(writer, 400, {'error': 'Malformed request line.'}, keep_alive=False)
+        return False
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close'
+
+    # Without a valid length the end of the body is unknown, so the connection cannot be reused
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+        if length < 0:
+            raise ValueError
+    except ValueError:
+        await _respond(writer, 400, {'error': 'Invalid Content-Length header.'}, keep_alive=False)
+        return False
+    if length > MAX_BODY_BYTES:
+        await _respond(writer, 413, {'error': 'Request body too large.'}, keep_alive=False)
+        return False
+    body = await reader.readexactly(length) if length else b''
+
+    if method == 'GET' and path == '/health':
+        await _respond(writer, 200, {'status': 'ok'}, keep_alive)
+    elif method == 'GET' and path == '/metrics':
+        await _respond(writer, 200, batcher.metrics(), keep_alive)
+    elif method == 'POST' and path == '/classify':
+        try:
+            texts = json.loads(body)['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            await _respond(writer, 400, {'error': 'Expected {"texts": [...]} with a list of strings.'}, keep_alive)
+            return keep_alive
+
+        try:
+            labels = await batcher.submit(texts)
+        except QueueFull:
+            await _respond(writer, 503, {'error': 'Server busy, retry later.'}, keep_alive, {'Retry-After': '1'})
+        except Exception as e:
+            await _respond(writer, 500, {'error': str(e)}, keep_alive)
+        else:
+            await _respond(writer, 200, {'labels': labels}, keep_alive)
+    else:
+        await _respond(writer, 404, {'error': f'No route for {method} {path}.'}, keep_alive)
+
+    return keep_alive
+
+
+async def _respond(writer, status, payload, keep_alive=True, extra_headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+    lines = [
+        f"HTTP/1.1 {status} {reasons[status]}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from orientx2.storage import PostsWriter, infer_format, iter_posts, read_posts
+
+CHECKPOINT_VERSION = 1
+
+# Rows read and classified at a time
+BATCH_ROWS = 256
+
+# Rows written to the output between checkpoints
+COMMIT_ROWS = 8192
+
+
+def checkpoint_path_for(output_path):
+    """Return the path of the progress checkpoint kept next to a classified posts file."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + '.progress.json')
+
+
+def classify_posts_streaming(input_path, output_path, classify, fingerprint=None, batch_rows=BATCH_ROWS,
+                             commit_rows=COMMIT_ROWS, format=None, on_progress=None):
+    """
+    Classify a table of posts batch by batch, writing results as they finish so a crash loses little work.
+
+    Every commit_rows rows the classified batches are written out and a checkpoint records how
+    many input rows are done and how large the output was at that point. A restarted run skips
+    those rows, after truncating CSV output back to its checkpointed size (or, for Parquet,
+    dropping the uncommitted part files). Memory is bounded by commit_rows, not by the input.
+
+    Parquet output is committed as part files in a sidecar directory, which are merged into the
+    output file once every row is classified.
+
+    The run starts over when the input file changed, or when the fingerprint differs from the
+    checkpointed one, and does nothing when the checkpoint says the output is complete. When
+    classify returns None labels for a batch, the batches before it are committed and a
+    RuntimeError is raised, so a rerun resumes at the failed batch.
+
+    Args:
+        input_path (str): CSV or Parquet file of parsed posts.
+        output_path (str): Where to write the posts with an 'orientation' column.
+        classify (callable): Maps a DataFrame of posts to a list of labels, None where it failed.
+        fingerprint (dict): JSON-serialisable settings the output depends on, e.g. the model hash.
+        batch_rows (int): Rows read and classified at a time.
+        commit_rows (int): Rows written between checkpoints.
+        format (str): 'csv' or 'parquet'; inferred from the suffix of output_path when None.
+        on_progress (callable): Called after every batch with the number of input rows done, and
+            the number of those classified by this run.
+
+    Returns:
+        int: The number of rows classified by this run.
+    """
+    format = infer_format(output_path, format)
+    checkpoint_path = checkpoint_path_for(output_path)
+    parts_dir = Path(str(output_path) + '.parts')
+    input_stat = os.stat(input_path)
+    expected = {
+        "version": CHECKPOINT_VERSION,
+        "input": str(Path(input_path).resolve()),
+        "input_size": input_stat.st_size,
+        "input_mtime_ns": input_stat.st_mtime_ns,
+        "format": format,
+        "fingerprint": fingerprint or {},
+    }
+
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if _can_resume(checkpoint, expected, output_path, parts_dir, format):
+        if checkpoint["complete"]:
+            print(f"'{output_path}' is already complete.")
+            return 0
+        rows_done, parts = checkpoint["rows_done"], checkpoint["parts"]
+        if format == "csv":
+            with open(output_path, 'r+b') as file:
+                file.truncate(checkpoint["output_size"])
+        else:
+            _remove_parts_from(parts_dir, parts)
+        print(f"Resuming after {rows_done} classified rows.")
+    else:
+        rows_done, parts = 0, 0
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    rows_classified = 0
+    pending = []
+    row = 0
+
+    for chunk in iter_posts(input_path, batch_rows, format=infer_format(input_path)):
+        # Skip the rows classified before the restart
+        start, row = row, row + len(chunk)
+        if row <= rows_done:
+            continue
+        chunk = chunk.iloc[rows_done - start:].copy()
+
+        labels = classify(chunk)
+        if any(label is None for label in labels):
+            # Commit only the batches before this one, so a rerun retries it rather than skipping it
+            if pending:
+                parts = _commit(pending, output_path, parts_dir, parts, format)
+                _save_checkpoint(checkpoint_path, _progress(expected, rows_done, parts, output_path, format))
+            raise RuntimeError(f"Classification failed for input rows {rows_done} to {rows_done + len(chunk) - 1}; "
+                               f"rerun to resume from row {rows_done}.")
+
+        chunk['orientation'] = labels
+        pending.append(chunk)
+        rows_done += len(chunk)
+        rows_classified += len(chunk)
+
+        if sum(len(batch) for batch in pending) >= commit_rows:
+            parts = _commit(pending, output_path, parts_dir, parts, format)
+            _save_checkpoint(checkpoint_path, _progress(expected, rows_done, parts, output_path, format))
+            pending = []
+
+        if on_progress is not None:
+            on_progress(rows_done, rows_classified)
+
+    if pending:
+        parts = _commit(pending, output_path, parts_dir, parts, format)
+    if rows_done == 0:
+        # An empty input still gets an output, with the columns but no rows
+        empty = read_posts(input_path, format=infer_format(input_path)).head(0).assign(orientation=[])
+        parts = _commit([empty], output_path, parts_dir, parts, format)
+    if format == "parquet" and parts:
+        _merge_parts(parts_dir, parts, output_path)
+    _save_checkpoint(checkpoint_path, dict(_progress(expected, rows_done, parts, output_path, format), complete=True))
+
+    return rows_classified
+
+
+def _commit(batches, output_path, parts_dir, parts, format):
+    """Durably write classified batches; return the number of committed Parquet parts."""
+    if format == "csv":
+        writer = PostsWriter(output_path, "csv", append=True)
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+        with open(output_path, 'rb') as file:
+            os.fsync(file.fileno())
+        return parts
+
+    parts_dir.mkdir(exist_ok=True)
+    part_path = parts_dir / f'part-{parts:06d}.parquet'
+    temp_path = part_path.with_name(part_path.name + '.tmp')
+    writer = PostsWriter(temp_path, "parquet")
+    for batch in batches:
+        writer.write(batch)
+    writer.close()
+    os.replace(temp_path, part_path)
+    return parts + 1
+
+
+def _merge_parts(parts_dir, parts, output_path):
+    """Merge the Parquet part files into the output, one part in memory at a time."""
+    temp_path = Path(str(output_path) + '.tmp')
+    writer = PostsWriter(temp_path, "parquet")
+    for part in range(parts):
+        writer.write(read_posts(parts_dir / f'part-{part:06d}.parquet'))
+    writer.close()
+    os.replace(temp_path, output_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def _remove_parts_from(parts_dir, parts):
+    for path in parts_dir.glob('part-*.parquet*'):
+        index = int(path.name.split('.')[0].split('-')[1])
+        if index >= parts or path.suffix == '.tmp':
+            path.unlink()
+
+
+def _progress(expected, rows_done, parts, output_path, format):
+    output_size = os.path.getsize(output_path) if format == "csv" and os.path.exists(output_path) else 0
+    return dict(expected, rows_done=rows_done, parts=parts, output_size=output_size, complete=False)
+
+
+def _can_resume(checkpoint, expected, output_path, parts_dir, format):
+    if checkpoint is None:
+        return False
+    if any(checkpoint.get(key) != value for key, value in expected.items()):
+        return False
+    if checkpoint["complete"]:
+        return os.path.exists(output_path)
+    if format == "csv":
+        return os.path.exists(output_path) and os.path.getsize(output_path) >= checkpoint["output_size"]
+    return all((parts_dir / f'part-{part:06d}.parquet').exists() for part in range(checkpoint["parts"]))
+
+
+def _load_checkpoint(checkpoint_path):
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    """Write the checkpoint atomically, so a crash leaves either the old or the new one."""
+    temp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file, indent=4)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, checkpoint_path)
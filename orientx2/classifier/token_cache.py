@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sqlite3
+import time
+from collections import deque
+
+import numpy as np
+import transformers
+
+# Default size limit of a token cache on disk
+CACHE_BYTES = 2 * 1024 ** 3
+
+# Size at which a new segment file is started; eviction removes whole segments
+SEGMENT_BYTES = 64 * 1024 ** 2
+
+TOKEN_DTYPE = np.int32
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Return a string identifying a tokenizer's name, version and vocabulary."""
+    digest = hashlib.sha256()
+    if getattr(tokenizer, 'is_fast', False):
+        digest.update(tokenizer.backend_tokenizer.to_str().encode('utf-8'))
+    else:
+        digest.update(repr(sorted(tokenizer.get_vocab().items())).encode('utf-8'))
+    return (f"{tokenizer.name_or_path}|{type(tokenizer).__name__}|transformers-{transformers.__version__}"
+            f"|{digest.hexdigest()[:16]}")
+
+
+class TokenCache:
+    """
+    Content-addressed on-disk cache of token ids, shared by training and inference.
+
+    Texts are keyed by their SHA-256 together with the tokenizer fingerprint and max_length,
+    so a rerun with new model weights but the same posts skips tokenization entirely, while a
+    different tokenizer or max_length never sees stale ids. Ids are appended to segment files
+    that are read back through numpy memory maps, and a SQLite index maps each key to its
+    segment, offset and length.
+
+    When the segments grow beyond max_bytes, the least recently used segments are deleted
+    along with their index entries. A segment counts as used whenever any of its texts is.
+
+    Args:
+        cache_dir (str): Directory holding the index and the segment files.
+        tokenizer: The Hugging Face tokenizer to encode misses with.
+        max_length (int): Length texts are truncated to.
+        max_bytes (int): Size limit of the segment files.
+        segment_bytes (int): Size at which a new segment is started.
+    """
+
+    def __init__(self, cache_dir, tokenizer, max_length, max_bytes=CACHE_BYTES, segment_bytes=SEGMENT_BYTES):
+        self.cache_dir = cache_dir
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.namespace = f"{tokenizer_fingerprint(tokenizer)}|max_length={max_length}"
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'))
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL, text_hash BLOB NOT NULL,
+                segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL,
+                PRIMARY KEY (namespace, text_hash)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment);
+        """)
+        self._maps = {}
+
+    def encode(self, texts, batch_size=1024):
+        """
+        Return the token ids of each text, tokenizing and caching only the texts not cached yet.
+
+        Returns:
+            list: One int32 numpy array of token ids per text, in the order of texts.
+        """
+        texts = list(texts)
+        hashes = [hashlib.sha256(text.encode('utf-8')).digest() for text in texts]
+        found = self._lookup(set(hashes))
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found:
+                missing.setdefault(text_hash, text)
+        self.hits += len(texts) - sum(text_hash not in found for text_hash in hashes)
+        self.misses += len(missing)
+
+        missing_items = list(missing.items())
+        for i in range(0, len(missing_items), batch_size):
+            batch = missing_items[i:i + batch_size]
+            encoding = self.tokenizer([text for _, text in batch], max_length=self.max_length, truncation=True)
+            arrays = [np.asarray(ids, dtype=TOKEN_DTYPE) for ids in encoding['input_ids']]
+            self._store([text_hash for text_hash, _ in batch], arrays)
+            found.update(zip((text_hash for text_hash, _ in batch), arrays))
+
+        self._evict()
+        return [found[text_hash] for text_hash in hashes]
+
+    def size(self):
+        """Return the total size of the segment files in bytes."""
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+
+    def close(self):
+        self._maps.clear()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _lookup(self, hashes):
+        """Return {text hash: token ids} for the cached hashes, and mark their segments as used."""
+        found, used_segments = {}, set()
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT text_hash, segment, offset, length FROM entries "
+                f"WHERE namespace = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [self.namespace, *batch]
+            ).fetchall()
+            for text_hash, segment, offset, length in rows:
+                found[text_hash] = np.array(self._segment_map(segment)[offset:offset + length])
+                used_segments.add(segment)
+
+        now = time.time()
+        self._db.executemany("UPDATE segments SET last_used = ? WHERE id = ?", [(now, s) for s in used_segments])
+        self._db.commit()
+        return found
+
+    def _store(self, hashes, arrays):
+        items = deque(zip(hashes, arrays))
+        while items:
+            segment, size = self._active_segment()
+
+            entries = []
+            path = self._segment_path(segment)
+            self._maps.pop(segment, None)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as file:
+                # Bytes past the recorded size were written by a run that died before committing
+                # their index entries; overwrite them so offsets match the file
+                file.truncate(size)
+                file.seek(size)
+                while items and size < self.segment_bytes:
+                    text_hash, ids = items.popleft()
+                    entries.append((self.namespace, text_hash, segment, size // ids.itemsize, len(ids)))
+                    file.write(ids.tobytes())
+                    size += ids.nbytes
+
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", entries)
+            self._db.execute("UPDATE segments SET size = ?, last_used = ? WHERE id = ?", (size, time.time(), segment))
+            self._db.commit()
+
+    def _active_segment(self):
+        """Return (id, size) of the segment to append to, starting a new one when the last is full."""
+        row = self._db.execute("SELECT id, size FROM segments ORDER BY id DESC LIMIT 1").fetchone()
+        if row is not None and row[1] < self.segment_bytes:
+            return row
+        segment = self._db.execute("INSERT INTO segments (size, last_used) VALUES (0, ?)", (time.time(),)).lastrowid
+        return segment, 0
+
+    def _evict(self):
+        """Delete the least recently used segments until the cache fits in max_bytes."""
+        segments = self._db.execute("SELECT id, size FROM segments ORDER BY last_used").fetchall()
+        total = sum(size for _, size in segments)
+
+        for segment, size in segments:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE segment = ?", (segment,))
+            self._db.execute("DELETE FROM segments WHERE id = ?", (segment,))
+            self._db.commit()
+            self._maps.pop(segment, None)
+            try:
+                os.remove(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _segment_map(self, segment):
+        if segment not in self._maps:
+            self._maps[segment] = np.memmap(self._segment_path(segment), dtype=TOKEN_DTYPE, mode='r')
+        return self._maps[segment]
+
+    def _segment_path(self, segment):
+        return os.path.join(self.cache_dir, f'segment-{segment:06d}.bin')
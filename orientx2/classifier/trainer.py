@@ -1,71 +1,184 @@
+import contextlib
+import time
+
 import torch
 from torch import nn
 from torch.utils.data import DataLoader
-from transformers import BertTokenizer, get_linear_schedule_with_warmup, get_scheduler
+from transformers import BertTokenizerFast, get_linear_schedule_with_warmup, get_scheduler
 from sklearn.metrics import accuracy_score, classification_report
-from .data_loader import TextClassificationDataset
+from .artifact import artifact_dir_for, load_artifact, save_artifact
+from .bucketing import BucketBatchSampler
+from .data_loader import PadCollator, PreTokenizedDataset
 from .model import BERTClassifier
+from .prediction_cache import checkpoint_sha256
+from .token_cache import TokenCache
+
+PRECISIONS = ('auto', 'fp32', 'bf16', 'fp16')
 
 
 class ClassificationPipeline:
-    def __init__(self, model_name="bert-base-uncased", num_classes=3, max_length=300, batch_size=4, lr=3e-5, epochs=2):
+    """
+    Train and run the BERT orientation classifier.
+
+    Training runs in float32 unless precision asks for autocast: 'auto' uses bfloat16 on the
+    CPU, and on CUDA bfloat16 where supported or float16 with a GradScaler otherwise. With an
+    effective_batch_size above batch_size, gradients are accumulated over mini-batches until
+    that many samples have been seen, so the optimizer steps as if on the larger batch while
+    memory stays bounded by the mini-batch.
+
+    Args:
+        effective_batch_size (int): Samples per optimizer step; batch_size when None.
+        precision (str): 'fp32' (default), 'auto', 'bf16' or 'fp16'.
+        num_workers (int): DataLoader worker processes.
+        pin_memory (bool): Pin batches in memory for faster copies to the GPU; on with CUDA when None.
+    """
+
+    def __init__(self, model_name="bert-base-uncased", num_classes=3, max_length=300, batch_size=4, lr=3e-5, epochs=2,
+                 token_cache_dir=None, model=None, tokenizer=None, effective_batch_size=None, precision='fp32',
+                 num_workers=0, pin_memory=None):
         self.model_name = model_name
         self.num_classes = num_classes
         self.max_length = max_length
         self.batch_size = batch_size
         self.lr = lr
         self.epochs = epochs
+        self.accumulation_steps = max(1, -(-(effective_batch_size or batch_size) // batch_size))
+        self.precision = precision
+        self.num_workers = num_workers
 
-        self.tokenizer = BertTokenizer.from_pretrained(model_name)
+        self.tokenizer = tokenizer if tokenizer is not None else BertTokenizerFast.from_pretrained(model_name)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = BERTClassifier(model_name, num_classes).to(self.device)  # Ensure the model is moved to the GPU
+        if model is None:
+            model = BERTClassifier(model_name, num_classes, device=self.device)
+        self.model = model.to(self.device)  # Ensure the model is moved to the GPU
+        self.pin_memory = self.device.type == 'cuda' if pin_memory is None else pin_memory
+
+        # Token ids of texts seen by earlier runs, shared with inference
+        self.token_cache = TokenCache(token_cache_dir, self.tokenizer, max_length) if token_cache_dir else None
+
+        # SHA-256 of the checkpoint the weights came from, when known without rehashing it
+        self.checkpoint_sha256 = None
 
         self.train_loader = None
         self.val_loader = None
 
+    @classmethod
+    def from_artifact(cls, directory, **kwargs):
+        """
+        Build a pipeline from a directory written by save_artifact.
+
+        Only the saved weights are read: the architecture comes from the saved config, and
+        neither the pretrained weights nor the Hub are touched. Other arguments are passed on.
+        """
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model, tokenizer, metadata = load_artifact(directory, device)
+        pipeline = cls(model_name=metadata["model_name"], num_classes=metadata["num_classes"],
+                       max_length=metadata["max_length"], model=model, tokenizer=tokenizer, **kwargs)
+        pipeline.checkpoint_sha256 = metadata.get("checkpoint_sha256")
+        return pipeline
+
     def prepare_data(self, train_texts, train_labels, val_texts, val_labels):
-        train_dataset = TextClassificationDataset(train_texts, train_labels, self.tokenizer, self.max_length)
-        val_dataset = TextClassificationDataset(val_texts, val_labels, self.tokenizer, self.max_length)
+        # Tokenize once; batches are padded to their longest text and built from texts of similar length
+        train_dataset = PreTokenizedDataset(train_texts, train_labels, self.tokenizer, self.max_length,
+                                            token_cache=self.token_cache)
+        val_dataset = PreTokenizedDataset(val_texts, val_labels, self.tokenizer, self.max_length,
+                                          token_cache=self.token_cache)
+        loader_options = dict(
+            collate_fn=PadCollator(self.tokenizer.pad_token_id),
+            num_workers=self.num_workers,
+            pin_memory=self.pin_memory,
+            persistent_workers=self.num_workers > 0,
+        )
 
-        self.train_loader = DataLoader(train_dataset, batch_size=self.batch_size, shuffle=True)
-        self.val_loader = DataLoader(val_dataset, batch_size=self.batch_size)
+        self.train_loader = DataLoader(
+            train_dataset, batch_sampler=BucketBatchSampler(train_dataset.lengths, self.batch_size), **loader_options
+        )
+        self.val_loader = DataLoader(
+            val_dataset, batch_sampler=BucketBatchSampler(val_dataset.lengths, self.batch_size, shuffle=False),
+            **loader_options
+        )
 
     def train(self, train_output_path):
         optimizer = torch.optim.AdamW(self.model.parameters(), lr=self.lr)
+        steps_per_epoch = -(-len(self.train_loader) // self.accumulation_steps)
         scheduler = get_scheduler(
-            "linear", optimizer=optimizer, num_warmup_steps=0, num_training_steps=len(self.train_loader) * self.epochs
+            "linear", optimizer=optimizer, num_warmup_steps=0, num_training_steps=steps_per_epoch * self.epochs
         )
         loss_fn = nn.CrossEntropyLoss()
+        autocast_dtype = self._autocast_dtype()
+        scaler = torch.amp.GradScaler('cuda') if autocast_dtype == torch.float16 else None
 
         for epoch in range(self.epochs):
+            self.train_loader.batch_sampler.set_epoch(epoch)
             self.model.train()
             total_loss = 0
+            samples = 0
+            epoch_start = time.perf_counter()
+            optimizer.zero_grad()
 
-            for batch in self.train_loader:
-                optimizer.zero_grad()
-
+            for step, batch in enumerate(self.train_loader, start=1):
                 # Move data to GPU
-                input_ids = batch['input_ids'].to(self.device)
-                attention_mask = batch['attention_mask'].to(self.device)
-                labels = batch['label'].to(self.device)
+                input_ids = batch['input_ids'].to(self.device, non_blocking=self.pin_memory)
+                attention_mask = batch['attention_mask'].to(self.device, non_blocking=self.pin_memory)
+                labels = batch['label'].to(self.device, non_blocking=self.pin_memory)
 
-                outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
-                loss = loss_fn(outputs, labels)
+                with self._autocast(autocast_dtype):
+                    outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
+                    loss = loss_fn(outputs.float(), labels)
                 total_loss += loss.item()
-
-                loss.backward()
-                torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=1.0)  # Gradient clipping
-                optimizer.step()
-                scheduler.step()
-
+                samples += len(labels)
+
+                # Average the gradients over the mini-batches of one optimizer step
+                loss = loss / self.accumulation_steps
+                if scaler is not None:
+                    scaler.scale(loss).backward()
+                else:
+                    loss.backward()
+
+                if step % self.accumulation_steps == 0 or step == len(self.train_loader):
+                    if scaler is not None:
+                        scaler.unscale_(optimizer)
+                    torch.nn.utils.clip_grad_norm_(self.model.parameters(), max_norm=1.0)  # Gradient clipping
+                    if scaler is not None:
+                        scaler.step(optimizer)
+                        scaler.update()
+                    else:
+                        optimizer.step()
+                    scheduler.step()
+                    optimizer.zero_grad()
+
+            samples_per_sec = samples / (time.perf_counter() - epoch_start)
             avg_loss = total_loss / len(self.train_loader)
             accuracy, report = self.evaluate()  # Ensure this uses the validation set
-            print(f"Epoch {epoch + 1}/{self.epochs}: Avg Loss = {avg_loss:.4f}, Accuracy = {accuracy:.4f}")
+            print(f"Epoch {epoch + 1}/{self.epochs}: Avg Loss = {avg_loss:.4f}, Accuracy = {accuracy:.4f}, "
+                  f"Speed = {samples_per_sec:.1f} samples/sec")
             print(report)
 
         self.save_model(train_output_path)
+        self.save_artifact(artifact_dir_for(train_output_path), train_output_path)
         print("Training Complete.")
 
+    def _autocast_dtype(self):
+        """Return the dtype to autocast training to, or None to train in fp32."""
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{self.precision}'. Please choose one of {PRECISIONS}.")
+        if self.precision == 'fp32':
+            return None
+        if self.precision == 'bf16':
+            return torch.bfloat16
+        if self.precision == 'fp16':
+            if self.device.type != 'cuda':
+                raise ValueError("fp16 training needs a CUDA device; use 'bf16' on the CPU.")
+            return torch.float16
+        if self.device.type == 'cuda' and not torch.cuda.is_bf16_supported():
+            return torch.float16
+        return torch.bfloat16
+
+    def _autocast(self, dtype):
+        if dtype is None:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=dtype)
+
     def evaluate(self):
         self.model.eval()
         predictions, actual_labels = [], []
@@ -90,6 +203,13 @@ class ClassificationPipeline:
     def save_model(self, path="assets/model.pth"):
         torch.save(self.model.state_dict(), path)
 
+    def save_artifact(self, directory, checkpoint_path=None):
+        """Save the model, config and tokenizer for from_artifact, recording the checkpoint they match."""
+        if checkpoint_path:
+            self.checkpoint_sha256 = checkpoint_sha256(checkpoint_path)
+        save_artifact(self.model, self.tokenizer, directory, self.model_name, self.max_length, checkpoint_path,
+                      self.checkpoint_sha256 if checkpoint_path else None)
+
     def load_model(self, path="assets/model.pth"):
         self.model.load_state_dict(torch.load(path))
         self.model.to(self.device)  # Ensure the loaded model is on the correct device
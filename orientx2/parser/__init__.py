@@ -1,3 +1,4 @@
-from .parser import parse_tweets, save_to_csv
+from .parser import parse_tweets, save_posts, save_to_csv, stream_tweets_to_file
+from .incremental import parse_tweets_incremental
 
-__all__ = ["parse_tweets", "save_to_csv"]
+__all__ = ["parse_tweets", "parse_tweets_incremental", "save_posts", "save_to_csv", "stream_tweets_to_file"]
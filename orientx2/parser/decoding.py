@@ -0,0 +1,77 @@
+import json
+import re
+
+BACKENDS = ("auto", "orjson", "simdjson", "json")
+
+# Backends tried, in order, when the backend is 'auto'
+_AUTO_ORDER = ("orjson", "simdjson")
+
+_SCREEN_NAME_PATTERN = re.compile(rb'"screen_name"\s*:\s*"([^"\\]*)"')
+
+
+def get_decoder(backend="auto"):
+    """
+    Return a function that decodes one line of tweet JSON (bytes or str).
+
+    'orjson' decodes the whole object in C. 'simdjson' returns lazy proxies, so only the
+    fields parse_tweet actually reads are turned into Python objects. Lines a fast backend
+    rejects are retried with the stdlib decoder (which, for example, accepts lone UTF-16
+    surrogates), so every backend accepts exactly the lines json.loads does.
+
+    Args:
+        backend (str): One of BACKENDS. 'auto' picks the fastest installed backend.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{backend}'. Please choose one of {BACKENDS}.")
+
+    if backend == "auto":
+        for name in _AUTO_ORDER:
+            try:
+                return get_decoder(name)
+            except ImportError:
+                continue
+        return json.loads
+
+    if backend == "orjson":
+        import orjson
+        return _with_fallback(orjson.loads)
+
+    if backend == "simdjson":
+        import simdjson
+        parser = simdjson.Parser()
+
+        def simdjson_loads(line):
+            if isinstance(line, str):
+                line = line.encode("utf-8")
+            return parser.parse(line)
+
+        return _with_fallback(simdjson_loads)
+
+    return json.loads
+
+
+def _with_fallback(loads):
+    def decode(line):
+        try:
+            return loads(line)
+        except ValueError:
+            return json.loads(line)
+
+    return decode
+
+
+def make_screen_name_filter(mp_dict):
+    """
+    Return a function that tells, from the raw bytes of a line, whether it may be by an MP.
+
+    The line is kept when any "screen_name" in it (the poster's, or that of a retweeted or
+    quoted user) is a handle in the MP dictionary. This never drops a line parse_tweet would
+    keep, but skips decoding most of the lines posted by other accounts.
+    """
+    screen_names = {handle[1:].encode("utf-8") for handle in mp_dict if handle.startswith("@")}
+    findall = _SCREEN_NAME_PATTERN.findall
+
+    def may_be_mp(line):
+        return any(name in screen_names for name in findall(line))
+
+    return may_be_mp
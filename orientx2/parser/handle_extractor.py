@@ -1,20 +1,24 @@
-import re
+from orientx2.parser.roster_discovery import scan_archive
+
 
 # Define a function to extract Twitter handles from a JSON file
-def extract_handles_from_json(json_file_path):
-    handle_pattern = r"@\w+"  # Regex pattern for Twitter handles
+def extract_handles_from_json(json_file_path, k=None):
+    """
+    Return the Twitter handles mentioned in a JSON-lines tweet archive, read as a stream.
 
-    with open(json_file_path, 'r', encoding='utf-8') as file:
-        content = file.read()  # Read the entire file as a string
+    With k, only the k most frequent handles are kept, in bounded memory; otherwise every
+    distinct handle is returned.
+    """
+    scan = scan_archive(json_file_path, k=k, exact=k is None, count_users=False)
+    return {handle for handle, _ in scan.handles.most_common()}
 
-    handles = set(re.findall(handle_pattern, content))  # Find all handles and store unique ones
-    return handles
 
-# Provide the JSON file path
-json_file_path = '/Users/josephhirsh/Documents/GitHub/orientx2/assets/MPs.tweets.json'
-twitter_handles = extract_handles_from_json(json_file_path)
+if __name__ == "__main__":
+    # Provide the JSON file path
+    json_file_path = '/Users/josephhirsh/Documents/GitHub/orientx2/assets/MPs.tweets.json'
+    twitter_handles = extract_handles_from_json(json_file_path)
 
-# Print or save the extracted handles
-print(f"Extracted {len(twitter_handles)} Twitter handles:")
-for handle in twitter_handles:
-    print(handle)
+    # Print or save the extracted handles
+    print(f"Extracted {len(twitter_handles)} Twitter handles:")
+    for handle in twitter_handles:
+        print(handle)
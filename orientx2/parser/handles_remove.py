@@ -1,21 +1,19 @@
 import pandas as pd
-import re
+
+from orientx2.parser.text_normalizer import TextNormalizer
+
+_handle_remover = TextNormalizer(replace_amp=False, strip_newlines=False, remove_links=False)
 
 
 def remove_handles(text):
     """
-    Remove "RT @twitterhandle:" and "@twitterhandle" from text.
+    Remove "RT @twitterhandle:" from text.
     Args:
         text (str): The input text.
     Returns:
         str: Cleaned text with handles removed.
     """
-    # Remove "RT @twitterhandle:" at the beginning
-    text = re.sub(r'\bRT @\w+:\s*', '', text)
-    # Remove all other "@twitterhandle"
-    #text = re.sub(r'@\w+', '', text)
-    # Strip extra spaces and return
-    return text.strip()
+    return _handle_remover.normalize(text)
 
 
 def clean_dataset(input_csv, output_csv):
@@ -33,7 +31,7 @@ def clean_dataset(input_csv, output_csv):
         raise ValueError("Input CSV must contain 'label' and 'text' columns.")
 
     # Clean the text column
-    df['text'] = df['text'].apply(remove_handles)
+    df['text'] = _handle_remover.normalize_series(df['text'])
 
     # Save the cleaned dataset to a new CSV file
     df.to_csv(output_csv, index=False)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from .parser import (CHUNK_ROWS, ChunkedPostsWriter, _complete_lines_end, _plain_shards, _shard_bytes,
+                     iter_tweet_shards)
+from .sources import codec_for, resolve_sources
+from orientx2.storage import infer_format
+
+MANIFEST_VERSION = 2
+
+
+def manifest_path_for(output_path):
+    """Return the path of the sidecar manifest kept next to an incrementally parsed output file."""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + '.manifest.json')
+
+
+def parse_tweets_incremental(json_file, mp_dict_path, output_path, start_date=datetime(2012, 10, 23),
+                             end_date=datetime(2016, 4, 4), workers=1, chunk_rows=CHUNK_ROWS, json_backend="auto"):
+    """
+    Parse only the tweets added to the archives since the last run and append them to the CSV.
+
+    A sidecar manifest records, for every archive file, the byte offset parsed up to, along
+    with the size of the output at that point and a hash of the MP dictionary. It is updated
+    after every shard, so an interrupted run resumes from the last completed shard: rows
+    written after it are truncated away first. Plain files that grew are parsed from their
+    recorded offset, and new files are parsed in full. Compressed files are parsed once.
+
+    The output is rebuilt from scratch when there is no usable manifest, when the MP dictionary
+    or date range changed, or when a recorded file was removed, shrank or (if compressed) was
+    rewritten. Lines that are not yet terminated by a newline are left for the next run.
+
+    Args:
+        json_file (str): Path, directory or glob of tweet archives, as for parse_tweets.
+        mp_dict_path (str): Path to the JSON file containing the MP dictionary.
+        output_path (str): Path of the CSV file to append to.
+        start_date (datetime): The starting date for filtering tweets.
+        end_date (datetime): The ending date for filtering tweets.
+        workers (int): Number of processes to parse with.
+        chunk_rows (int): Number of rows buffered before each write.
+        json_backend (str): JSON decoder to use ('auto', 'orjson', 'simdjson' or 'json').
+
+    Returns:
+        int: The number of rows appended.
+    """
+    if infer_format(output_path) != "csv":
+        raise ValueError("Incremental parsing can only append to CSV output.")
+
+    manifest_path = manifest_path_for(output_path)
+    expected = {
+        "version": MANIFEST_VERSION,
+        "mp_dict_sha256": _file_sha256(mp_dict_path),
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+    }
+    sources = [str(Path(source).resolve()) for source in resolve_sources(json_file)]
+
+    manifest = _load_manifest(manifest_path)
+    if _can_resume(manifest, expected, sources, output_path):
+        offsets = manifest["sources"]
+        rows_total = manifest["rows"]
+        with open(output_path, 'r+b') as file:
+            file.truncate(manifest["output_size"])
+        print(f"Resuming from the previous run's manifest '{manifest_path}'.")
+    else:
+        if manifest is not None:
+            print("MP dictionary, date range or archives changed since the last run. Rebuilding.")
+        offsets = {}
+        rows_total = 0
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    shards = _plan_new_shards(sources, offsets, workers)
+    if not shards:
+        print("No new tweets to parse.")
+        return 0
+
+    unknowns = set()
+    rows_appended = 0
+    writer = ChunkedPostsWriter(output_path, chunk_rows, append=True)
+
+    try:
+        for (source, _, shard_end), shard_rows, shard_unknowns in iter_tweet_shards(
+                shards, mp_dict_path, start_date, end_date, workers, json_backend):
+            writer.write_rows(shard_rows)
+            writer.flush()
+            unknowns.update(shard_unknowns)
+            rows_appended += len(shard_rows)
+
+            # Compressed files are parsed whole, and recorded by their size
+            offsets[source] = os.path.getsize(source) if shard_end is None else shard_end
+            _save_manifest(manifest_path, dict(
+                expected,
+                sources=offsets,
+                rows=rows_total + rows_appended,
+                output_size=os.path.getsize(output_path),
+            ))
+    finally:
+        writer.close()
+
+    print(f"Unknown posters: {unknowns}")
+    if writer.rows_written:
+        print(f"Date range of new rows: {writer.date_range}")
+    print(f"Appended {rows_appended} rows to '{output_path}' ({rows_total + rows_appended} in total).")
+
+    return rows_appended
+
+
+def _plan_new_shards(sources, offsets, workers):
+    """Return the shards of the archives that are not yet covered by the recorded offsets."""
+    ends = {}
+    for source in sources:
+        if codec_for(source) is None:
+            ends[source] = _complete_lines_end(source)
+
+    new_bytes = sum(end - offsets.get(source, 0) for source, end in ends.items())
+    shard_bytes = _shard_bytes(new_bytes, workers)
+
+    shards = []
+    for source in sources:
+        if codec_for(source) is not None:
+            if source not in offsets:
+                shards.append((source, 0, None))
+        elif ends[source] > offsets.get(source, 0):
+            shards.extend(_plain_shards(source, offsets.get(source, 0), ends[source], shard_bytes))
+    return shards
+
+
+def _can_resume(manifest, expected, sources, output_path):
+    if manifest is None:
+        return False
+    if any(manifest.get(key) != value for key, value in expected.items()):
+        return False
+    if not os.path.exists(output_path) or os.path.getsize(output_path) < manifest["output_size"]:
+        return False
+
+    for source, offset in manifest["sources"].items():
+        # A removed file, a shorter one, or a rewritten compressed one cannot be appended to
+        if source not in sources:
+            return False
+        size = os.path.getsize(source)
+        if size < offset or (codec_for(source) is not None and size != offset):
+            return False
+    return True
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_manifest(manifest_path, manifest):
+    """Write the manifest atomically, so a crash leaves either the old or the new one."""
+    temp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=4)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, manifest_path)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
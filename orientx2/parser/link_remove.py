@@ -1,5 +1,8 @@
 import pandas as pd
-import re
+
+from orientx2.parser.text_normalizer import TextNormalizer
+
+_link_remover = TextNormalizer(replace_amp=False, strip_newlines=False, remove_retweet_handles=False)
 
 
 def remove_links(text):
@@ -12,9 +15,7 @@ def remove_links(text):
     Returns:
         str: The text with all links removed.
     """
-    if isinstance(text, str):
-        return re.sub(r'http[s]?://\S+', '', text).strip()
-    return text
+    return _link_remover.normalize(text)
 
 
 def clean_csv(input_csv, output_csv):
@@ -33,7 +34,7 @@ def clean_csv(input_csv, output_csv):
             raise ValueError("Input CSV does not contain a 'text' column.")
 
         # Remove links from the 'text' column
-        df['text'] = df['text'].apply(remove_links)
+        df['text'] = _link_remover.normalize_series(df['text'])
 
         # Save the cleaned data
         df.to_csv(output_csv, index=False, encoding='utf-8')
@@ -1,22 +1,66 @@
+import argparse
 import sys
 import time
 from pathlib import Path
 
-from orientx2.parser import parse_tweets, save_to_csv
+from orientx2.parser import parse_tweets, parse_tweets_incremental, save_posts, stream_tweets_to_file
+from orientx2.parser.decoding import BACKENDS
+from orientx2.storage import FORMATS, with_format_suffix
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Parse MP tweets into a CSV of posts.")
+    parser.add_argument('--input', type=str, default=None,
+                        help="Tweet archive to parse: a file, a directory or a glob of JSON-lines files, which may "
+                             "be compressed (.gz, .bz2, .xz, .zst) (default: assets/MPs.tweets.json)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes to parse the tweet archive with (default: 1)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Write parsed posts to the output in chunks as they are parsed, keeping memory bounded")
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="Output format for the parsed posts (default: csv)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only parse tweets added since the last run and append them to the CSV. "
+                             "Also resumes an interrupted run")
+    parser.add_argument('--json-backend', choices=BACKENDS, default='auto',
+                        help="JSON decoder for the tweet archive (default: fastest installed)")
+    args = parser.parse_args(argv)
+    if args.incremental and args.format != 'csv':
+        parser.error("--incremental can only append to CSV output; use --format csv")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
     current_dir = Path(__file__).resolve().parent
-    json_file_path = current_dir.parent.parent / 'assets' / 'MPs.tweets.json'
-    output_csv_path = current_dir.parent.parent / 'assets' / 'parsed_posts.csv'
+    json_file_path = args.input or current_dir.parent.parent / 'assets' / 'MPs.tweets.json'
+    output_path = with_format_suffix(current_dir.parent.parent / 'assets' / 'parsed_posts', args.format)
     mp_dict_path = current_dir.parent.parent / 'assets' / 'uk_mps.json'
 
     start_time = time.time()
 
+    if args.incremental or args.stream:
+        try:
+            if args.incremental:
+                parse_tweets_incremental(json_file_path, mp_dict_path, output_path, workers=args.workers,
+                                         json_backend=args.json_backend)
+            else:
+                stream_tweets_to_file(json_file_path, mp_dict_path, output_path, workers=args.workers,
+                                      json_backend=args.json_backend)
+        except KeyboardInterrupt:
+            elapsed_time = time.time() - start_time
+            print(f"\nProcess interrupted after {elapsed_time:.2f} seconds.")
+            sys.exit(0)
+
+        elapsed_time = time.time() - start_time
+        print(f"Process completed in {elapsed_time:.2f} seconds.")
+        return
+
     df = None
 
     try:
-        df = parse_tweets(json_file_path, mp_dict_path)
+        df = parse_tweets(json_file_path, mp_dict_path, workers=args.workers, json_backend=args.json_backend)
         print(df)
 
     except KeyboardInterrupt:
@@ -26,9 +70,9 @@ def main():
 
     finally:
         try:
-            save_to_csv(df, output_csv_path)
+            save_posts(df, output_path)
         except Exception as e:
-            print(f"Error saving to CSV: {e}")
+            print(f"Error saving to {args.format.upper()}: {e}")
 
         elapsed_time = time.time() - start_time
         print(f"Process completed in {elapsed_time:.2f} seconds.")
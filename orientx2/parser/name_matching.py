@@ -0,0 +1,152 @@
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from fuzzywuzzy import fuzz, utils
+
+# Nickname mapping applied when standardizing names
+NICKNAMES = {
+    "Bill": "William",
+    "Bob": "Robert",
+    "Nick": "Nicholas"
+}
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+# Index of a pool worker, set once by _init_worker
+_worker_index = None
+
+
+def standardize_name(name, nickname_map=NICKNAMES):
+    """Convert "Doe, John (Party)" to "John Doe" and replace nicknames with full first names."""
+    # Convert "Doe, John" to "John Doe"
+    if ',' in name:
+        last_name, first_name = map(str.strip, name.split(',', 1))
+        name = f"{first_name} {last_name}"
+    # Remove text in parentheses
+    name = re.sub(r'\s*\(.*?\)\s*', ' ', name).strip()
+    # Replace nicknames
+    if nickname_map:
+        name = ' '.join(nickname_map.get(part, part) for part in name.split())
+    return name
+
+
+def soundex(word):
+    """Return the American Soundex code of a word, e.g. 'Robert' -> 'R163'."""
+    word = ''.join(char for char in word.lower() if char.isalpha())
+    if not word:
+        return ""
+
+    code = word[0].upper()
+    previous = _SOUNDEX_CODES.get(word[0], "")
+    for char in word[1:]:
+        digit = _SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # 'h' and 'w' do not separate letters with the same code; vowels do
+        if char not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+class NameIndex:
+    """
+    Fuzzy name-matching index over a list of entries, such as the rows of a roster CSV.
+
+    Each name is standardized and tokenized once. Names are grouped into blocks by each of
+    their tokens, its Soundex code and its character trigrams, and a query is only scored
+    against the names that share a block with it, instead of against the whole roster.
+    Scores are fuzz.token_sort_ratio scores, so matches agree with scanning every name
+    with process.extractOne whenever the best match shares a block with the query.
+
+    Args:
+        entries (list): The entries to match against (e.g. dicts from csv.DictReader).
+        key (str): The entry field holding the name.
+        nickname_map (dict): Nicknames replaced by standardize_name.
+    """
+
+    def __init__(self, entries, key='Name', nickname_map=NICKNAMES):
+        self.entries = list(entries)
+        self.nickname_map = nickname_map
+        self.names = [standardize_name(entry[key], nickname_map) for entry in self.entries]
+
+        self._sorted_tokens = [_sorted_tokens(name) for name in self.names]
+        self._blocks = defaultdict(list)
+        for i, tokens in enumerate(self._sorted_tokens):
+            for block_key in _block_keys(tokens):
+                self._blocks[block_key].append(i)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def candidates(self, name):
+        """Return the indices of the entries sharing a block with a standardized name, in entry order."""
+        indices = set()
+        for block_key in _block_keys(_sorted_tokens(name)):
+            indices.update(self._blocks.get(block_key, ()))
+        return sorted(indices)
+
+    def match(self, name, threshold=80, standardized=False):
+        """
+        Return (entry, matched name, score) for the best match of a name.
+
+        The entry is None when no candidate scores above the threshold. Ties go to the
+        earliest entry, as with process.extractOne.
+        """
+        if not standardized:
+            name = standardize_name(name, self.nickname_map)
+        query = _sorted_tokens(name)
+
+        best_index, best_score = None, 0
+        for i in self.candidates(name):
+            score = fuzz.ratio(query, self._sorted_tokens[i])
+            if best_index is None or score > best_score:
+                best_index, best_score = i, score
+
+        if best_index is None or best_score <= threshold:
+            return None, None, best_score
+        return self.entries[best_index], self.names[best_index], best_score
+
+    def match_many(self, names, threshold=80, standardized=False, workers=1, chunk_size=256):
+        """Match a list of names, optionally across a process pool, and return the results in order."""
+        if workers <= 1 or len(names) <= chunk_size:
+            return [self.match(name, threshold, standardized) for name in names]
+
+        chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            results = executor.map(_match_chunk, chunks, [threshold] * len(chunks), [standardized] * len(chunks))
+            return [result for chunk_results in results for result in chunk_results]
+
+
+def _sorted_tokens(name):
+    """Process a name the way fuzz.token_sort_ratio does: lowercase, alphanumeric, tokens sorted."""
+    return ' '.join(sorted(utils.full_process(name, force_ascii=True).split()))
+
+
+def _block_keys(sorted_tokens):
+    keys = set()
+    for token in sorted_tokens.split():
+        keys.add(f"t:{token}")
+        phonetic_key = soundex(token)
+        if phonetic_key:
+            keys.add(f"p:{phonetic_key}")
+        keys.update(f"g:{token[i:i + 3]}" for i in range(len(token) - 2))
+    return keys
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _match_chunk(names, threshold, standardized):
+    return [_worker_index.match(name, threshold, standardized) for name in names]
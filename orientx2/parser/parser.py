@@ -1,8 +1,50 @@
 import json
+import os
 import pandas as pd
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import islice
 import re
 
+from orientx2.storage import PostsWriter, infer_format, write_posts
+from .decoding import get_decoder, make_screen_name_filter
+from .sources import codec_for, open_source, resolve_sources
+from .text_normalizer import TextNormalizer
+
+# Number of byte-range shards handed to each worker; more shards than workers
+# keeps the pool busy when some parts of the archive are denser than others.
+SHARDS_PER_WORKER = 4
+
+# Upper bound on the size of a shard, which bounds how many parsed rows are held
+# in memory per shard when streaming.
+SHARD_BYTES = 32 * 1024 * 1024
+
+# Number of parsed rows buffered before the streaming writer flushes them to disk.
+CHUNK_ROWS = 50_000
+
+COLUMNS = ["name", "party", "content", "date", "retweets", "favorites", "referendum vote"]
+
+TWITTER_DATE_FORMAT = '%a %b %d %H:%M:%S +0000 %Y'
+
+_TWITTER_DATE_PATTERN = re.compile(
+    r'(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) '
+    r'[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} \+0000 [0-9]{4}'
+)
+
+_MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+
+# 'Oct 10 2018' -> date(2018, 10, 10), or False for an invalid day such as 'Feb 30'
+_day_cache = {}
+
+_normalizer = TextNormalizer()
+
+# MP dictionary, JSON decoder and screen-name pre-filter of a pool worker, set up once by _init_worker.
+_worker_mp_dict = None
+_worker_loads = None
+_worker_prefilter = None
+
 
 def load_mp_dict(json_file):
     """Load and return the MP dictionary from a JSON file."""
@@ -10,26 +52,280 @@ def load_mp_dict(json_file):
         return json.load(file)
 
 
-def parse_tweets(json_file, mp_dict_path, start_date=datetime(2012, 10, 23), end_date=datetime(2016, 4, 4)):
+def parse_tweets(json_file, mp_dict_path, start_date=datetime(2012, 10, 23), end_date=datetime(2016, 4, 4),
+                 workers=1, json_backend="auto"):
     """
     Parse tweets and match them with the poster's party from the MP dictionary.
 
     Args:
-        json_file (str): Path to the JSON file containing tweet data.
+        json_file (str): Path to the JSON file containing tweet data, or a directory or glob of
+            JSON-lines files, each optionally compressed (.gz, .bz2, .xz or .zst). Files are read
+            in name order and compressed ones are decompressed as they are read.
         mp_dict_path (str): Path to the JSON file containing the MP dictionary.
         start_date (datetime): The starting date for filtering tweets (default is January 1, 2013).
         end_date (datetime): The ending date for filtering tweets (default is March 29, 2024).
+        workers (int): Number of processes to parse with. With more than one, plain files are split
+            into newline-aligned byte ranges and compressed files are taken whole; these shards are
+            parsed in a process pool and merged back in file order, so the result is identical to
+            the serial path.
+        json_backend (str): JSON decoder to use ('auto', 'orjson', 'simdjson' or 'json').
 
     Returns:
         pd.DataFrame: A DataFrame containing parsed tweet data.
     """
-    mp_dict = load_mp_dict(mp_dict_path)
     rows = []
+    unknowns = set()
+
+    shards = plan_shards(json_file, workers)
+    for _, shard_rows, shard_unknowns in iter_tweet_shards(shards, mp_dict_path, start_date, end_date, workers,
+                                                           json_backend):
+        rows.extend(shard_rows)
+        unknowns.update(shard_unknowns)
+
+    print(f"Unknown posters: {unknowns}")
+
+    return pd.DataFrame(rows)
+
+
+def stream_tweets_to_file(json_file, mp_dict_path, output_path, start_date=datetime(2012, 10, 23),
+                          end_date=datetime(2016, 4, 4), workers=1, chunk_rows=CHUNK_ROWS, format=None,
+                          json_backend="auto"):
+    """
+    Parse tweets and write them to CSV or Parquet in fixed-size chunks as they are parsed.
+
+    Unlike parse_tweets, rows are never collected into one DataFrame, so memory stays
+    bounded by the chunk and shard sizes however large the archive is. The output is
+    the same as save_posts(parse_tweets(...)).
+
+    Args:
+        json_file (str): Path, directory or glob of tweet archives, as for parse_tweets.
+        mp_dict_path (str): Path to the JSON file containing the MP dictionary.
+        output_path (str): Path of the CSV or Parquet file to write.
+        start_date (datetime): The starting date for filtering tweets.
+        end_date (datetime): The ending date for filtering tweets.
+        workers (int): Number of processes to parse with.
+        chunk_rows (int): Number of rows buffered before each write.
+        format (str): 'csv' or 'parquet'; inferred from the output suffix when None.
+        json_backend (str): JSON decoder to use ('auto', 'orjson', 'simdjson' or 'json').
+
+    Returns:
+        int: The number of rows written.
+    """
+    unknowns = set()
+    writer = ChunkedPostsWriter(output_path, chunk_rows, format)
+
+    try:
+        shards = plan_shards(json_file, workers)
+        for _, shard_rows, shard_unknowns in iter_tweet_shards(shards, mp_dict_path, start_date, end_date, workers,
+                                                               json_backend):
+            writer.write_rows(shard_rows)
+            unknowns.update(shard_unknowns)
+    finally:
+        writer.close()
+
+    print(f"Unknown posters: {unknowns}")
+    if writer.rows_written:
+        print(f"Date range: {writer.date_range}")
+    print(f"Data successfully saved to '{output_path}'.")
+
+    return writer.rows_written
+
+
+def plan_shards(json_file, workers=1):
+    """
+    Split the archives named by json_file into shards, in output order.
+
+    Each shard is a (source, start, end) tuple. Plain files are split into newline-aligned
+    byte ranges of at most SHARD_BYTES, or smaller so that every worker gets several shards.
+    Compressed files cannot be split and become one shard each, with start 0 and end None.
+    """
+    sources = resolve_sources(json_file)
+    plain_bytes = sum(os.path.getsize(source) for source in sources if codec_for(source) is None)
+    shard_bytes = _shard_bytes(plain_bytes, workers)
+
+    shards = []
+    for source in sources:
+        if codec_for(source) is None:
+            shards.extend(_plain_shards(source, 0, os.path.getsize(source), shard_bytes))
+        else:
+            shards.append((source, 0, None))
+    return shards
+
+
+def iter_tweet_shards(shards, mp_dict_path, start_date, end_date, workers=1, json_backend="auto"):
+    """
+    Yield (shard, rows, unknowns) for each shard from plan_shards, in order.
+
+    With more than one worker the shards are parsed in a process pool, with only a few shards
+    per worker in flight at any time, and compressed shards are decompressed in the workers.
+    Lines whose raw bytes name no MP screen name are skipped before they are decoded.
+    """
+    if workers <= 1:
+        mp_dict = load_mp_dict(mp_dict_path)
+        loads = get_decoder(json_backend)
+        prefilter = make_screen_name_filter(mp_dict)
+        for shard in shards:
+            yield (shard,) + _parse_range(*shard, mp_dict, start_date, end_date, loads, prefilter)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mp_dict_path, json_backend)) as executor:
+        pending = deque()
+        shards = iter(shards)
+
+        def submit(shard):
+            pending.append((shard, executor.submit(_parse_shard, *shard, start_date, end_date)))
+
+        for shard in islice(shards, workers * SHARDS_PER_WORKER):
+            submit(shard)
+
+        # Collect in submission order so rows stay in file order
+        while pending:
+            shard, future = pending.popleft()
+            rows, unknowns = future.result()
+            for next_shard in islice(shards, 1):
+                submit(next_shard)
+            yield shard, rows, unknowns
+
+
+class ChunkedPostsWriter:
+    """Buffer parsed rows and write them to a CSV or Parquet file in fixed-size chunks."""
+
+    def __init__(self, output_path, chunk_rows=CHUNK_ROWS, format=None, append=False):
+        self.chunk_rows = chunk_rows
+        self.rows_written = 0
+        self.min_date = None
+        self.max_date = None
+
+        self._buffer = []
+        self._started = False
+        self._writer = PostsWriter(output_path, format, append)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if not self._buffer and self._started:
+            return
+
+        chunk = pd.DataFrame(self._buffer, columns=COLUMNS)
+        self._update_date_range(chunk)
+        self._writer.write(chunk)
+
+        self._started = True
+        self.rows_written += len(chunk)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    @property
+    def date_range(self):
+        """Return the date range of the rows written so far, as _get_date_range does."""
+        if self.min_date is not None:
+            return f"{self.min_date} - {self.max_date}"
+        return "No valid dates found."
+
+    def _update_date_range(self, chunk):
+        valid_dates = pd.to_datetime(chunk["date"]).dropna()
+        if valid_dates.empty:
+            return
+
+        chunk_min, chunk_max = valid_dates.min(), valid_dates.max()
+        self.min_date = chunk_min if self.min_date is None else min(self.min_date, chunk_min)
+        self.max_date = chunk_max if self.max_date is None else max(self.max_date, chunk_max)
+
+
+def _shard_bytes(plain_bytes, workers):
+    """Return the shard size for splitting plain files between workers."""
+    if workers <= 1:
+        return SHARD_BYTES
+    return max(1, min(SHARD_BYTES, -(-plain_bytes // (workers * SHARDS_PER_WORKER))))
 
-    with open(json_file, 'r', encoding='utf-8') as file:
-        unknowns = set()
-        for line in file:
-            tweet = parse_tweet(line, mp_dict, start_date, end_date)
+
+def _plain_shards(source, start, end, shard_bytes):
+    """Return the (source, start, end) shards covering [start, end) of a plain file."""
+    shard_count = max(1, -(-(end - start) // shard_bytes))
+    return [(source, shard_start, shard_end) for shard_start, shard_end in _shard_offsets(source, shard_count, start, end)]
+
+
+def _shard_offsets(json_file, shard_count, start=0, end=None):
+    """Split [start, end) of the file into byte ranges that begin and end on line boundaries."""
+    if end is None:
+        end = os.path.getsize(json_file)
+    bounds = [start]
+
+    with open(json_file, 'rb') as file:
+        for i in range(1, shard_count):
+            target = start + (end - start) * i // shard_count
+            if target <= bounds[-1]:
+                continue
+            file.seek(target)
+            file.readline()  # Move to the start of the next line
+            if file.tell() >= end:
+                break
+            bounds.append(file.tell())
+
+    bounds.append(end)
+    return [(shard_start, shard_end) for shard_start, shard_end in zip(bounds, bounds[1:]) if shard_end > shard_start]
+
+
+def _complete_lines_end(json_file):
+    """Return the offset just after the last newline, so a line still being appended is left alone."""
+    size = os.path.getsize(json_file)
+    block = 64 * 1024
+
+    with open(json_file, 'rb') as file:
+        position = size
+        while position > 0:
+            read_from = max(0, position - block)
+            file.seek(read_from)
+            newline = file.read(position - read_from).rfind(b'\n')
+            if newline != -1:
+                return read_from + newline + 1
+            position = read_from
+    return 0
+
+
+def _init_worker(mp_dict_path, json_backend="auto"):
+    """Load the MP dictionary and set up the decoder once per pool worker."""
+    global _worker_mp_dict, _worker_loads, _worker_prefilter
+    _worker_mp_dict = load_mp_dict(mp_dict_path)
+    _worker_loads = get_decoder(json_backend)
+    _worker_prefilter = make_screen_name_filter(_worker_mp_dict)
+
+
+def _parse_shard(json_file, start, end, start_date, end_date):
+    """Parse one byte range inside a pool worker."""
+    return _parse_range(json_file, start, end, _worker_mp_dict, start_date, end_date, _worker_loads,
+                        _worker_prefilter)
+
+
+def _parse_range(json_file, start, end, mp_dict, start_date, end_date, loads=json.loads, prefilter=None):
+    """
+    Parse the lines in [start, end) of the file and return (rows, unknowns).
+
+    When end is None the whole file is read, decompressing it on the fly if needed.
+    """
+    rows = []
+    unknowns = set()
+
+    with open_source(json_file) as file:
+        if end is None:
+            lines = file
+        else:
+            file.seek(start)
+            lines = _lines_until(file, start, end)
+
+        for line in lines:
+            if prefilter is not None and not prefilter(line):
+                continue
+
+            tweet = parse_tweet(line, mp_dict, start_date, end_date, loads)
 
             if tweet:
                 if tweet.get("real name") == "Unknown":
@@ -37,16 +333,31 @@ def parse_tweets(json_file, mp_dict_path, start_date=datetime(2012, 10, 23), end
 
                 rows.append(tweet)
 
-        print(f"Unknown posters: {unknowns}")
+    return rows, unknowns
 
-    return pd.DataFrame(rows)
+
+def _lines_until(file, position, end):
+    """Yield lines from position, stopping at the end offset."""
+    while position < end:
+        line = file.readline()
+        if not line:
+            return
+        position += len(line)
+        yield line
 
 
-def parse_tweet(line, mp_dict, start_date, end_date):
-    """Parse a single tweet and return its formatted data."""
+def parse_tweet(line, mp_dict, start_date, end_date, loads=json.loads):
+    """Parse a single tweet (a line of JSON, as str or bytes) and return its formatted data."""
     try:
-        tweet = json.loads(line)
-        tweet_date = _parse_date(tweet.get("created_at", ""))
+        tweet = loads(line)
+        created_at = tweet.get("created_at", "")
+
+        # Skip tweets from days outside the date range before building a datetime
+        tweet_day = _parse_day(created_at)
+        if tweet_day and (tweet_day < start_date.date() or tweet_day > end_date.date()):
+            return None
+
+        tweet_date = _parse_date(created_at)
 
         # Skip tweets outside the date range
         if tweet_date and (tweet_date < start_date or tweet_date > end_date):
@@ -61,93 +372,79 @@ def parse_tweet(line, mp_dict, start_date, end_date):
         party = mp_dict.get(twitter_handle, {}).get("Party", "Unknown")
         referendum_vote = mp_dict.get(twitter_handle, {}).get("Referendum vote", "Unknown")
 
-        content1 = _strip_newlines(_replace_amp(get_tweet_text(tweet)))
-
-        if content1 == "":
-            return
-
-        content2 = _remove_links(content1)  # Remove links from the content
-
-        if content2 == "":
-            return
-
-        content3 = _remove_handles(content2)  # Remove any lingering Twitter handles
+        # Replace '&amp;', strip newlines and remove links and "RT @twitterhandle:" prefixes
+        content = _normalizer.normalize(get_tweet_text(tweet))
 
-        if content3 == "":
-            print("@@@@@", content1)
+        if content == "":
             return
 
         return {
             "name": poster_name,
             "party": party,
-            "content": content3,
+            "content": content,
             "date": tweet_date,
             "retweets": tweet.get("retweet_count", 0),
             "favorites": tweet.get("favorite_count", 0),
             "referendum vote": referendum_vote
         }
-    except json.JSONDecodeError:
+    except ValueError:  # JSONDecodeError, or the equivalent error of another decoder
         print("Error decoding JSON for a line. Skipping.")
         return None
 
 
-def _remove_links(text):
-    """Remove all links from the text."""
-    # Regular expression to match URLs (http, https, ftp, etc.)
-    return re.sub(r'http[s]?://\S+', '', text).strip()
-
-
-def _remove_handles(text):
-    """
-    Remove "RT @twitterhandle:" and "@twitterhandle" from text.
-    Args:
-        text (str): The input text.
-    Returns:
-        str: Cleaned text with handles removed.
-    """
-    # Remove "RT @twitterhandle:" at the beginning
-    text = re.sub(r'\bRT @\w+:\s*', '', text)
-    # Remove all other "@twitterhandle"
-    #text = re.sub(r'@\w+', '', text)
-    # Strip extra spaces and return
-    return text.strip()
-
-
 def get_tweet_text(tweet):
-    """Retrieve the text of a tweet, handling retweets and quote retweets."""
+    """Retrieve the raw text of a tweet, handling retweets and quote retweets."""
     if "retweeted_status" in tweet:  # Simple retweet
         original_tweet = tweet["retweeted_status"]
         original_author = original_tweet["user"]["screen_name"]
         original_text = original_tweet["text"]
-        return _remove_handles(f"RT @{original_author}: {original_text}")
+        return f"RT @{original_author}: {original_text}"
     elif "quoted_status" in tweet:  # Quote retweet
         user_text = tweet["text"]
         quoted_tweet = tweet["quoted_status"]
         quoted_author = quoted_tweet["user"]["screen_name"]
         quoted_text = quoted_tweet["text"]
-        return _remove_handles(f"{user_text}\nQuoted: RT @{quoted_author}: {quoted_text}")
+        return f"{user_text}\nQuoted: RT @{quoted_author}: {quoted_text}"
     else:  # Normal tweet
-        return _remove_handles(tweet["text"])
+        return tweet["text"]
 
 
 
 def _parse_date(date_str):
     """Convert date string to datetime object."""
+    day = _parse_day(date_str)
+    if day:
+        try:
+            return datetime(day.year, day.month, day.day,
+                            int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19]))
+        except ValueError:
+            pass
+
+    # Anything not in Twitter's fixed layout goes through strptime
     try:
-        return datetime.strptime(date_str, '%a %b %d %H:%M:%S +0000 %Y')
+        return datetime.strptime(date_str, TWITTER_DATE_FORMAT)
     except ValueError:
         print(f"Error parsing date: {date_str}")
         return None
 
 
-def _strip_newlines(text):
-    """Remove newlines and extra spaces from text."""
-    return text.replace("\n", " ").replace("\r", " ").strip()
-
+def _parse_day(date_str):
+    """
+    Return the date of a timestamp in Twitter's fixed layout ('Wed Oct 10 20:19:24 +0000 2018'),
+    or None if the string is not in that layout. Dates are memoised per day.
+    """
+    if not _TWITTER_DATE_PATTERN.fullmatch(date_str):
+        return None
 
-def _replace_amp(text):
-    """Replace '&amp;' with '&' in tweet text."""
-    return text.replace("&amp;", "&")
+    key = date_str[4:10] + date_str[25:]
+    day = _day_cache.get(key)
+    if day is None:
+        try:
+            day = date(int(date_str[26:]), _MONTHS[date_str[4:7]], int(date_str[8:10]))
+        except ValueError:
+            day = False
+        _day_cache[key] = day
+    return day
 
 
 def save_to_csv(df, output_csv_path):
@@ -159,6 +456,18 @@ def save_to_csv(df, output_csv_path):
     print(f"Data successfully saved to '{output_csv_path}'.")
 
 
+def save_posts(df, output_path, format=None):
+    """Save DataFrame to CSV or Parquet (chosen from the suffix unless given) and print date range."""
+    if infer_format(output_path, format) == "csv":
+        return save_to_csv(df, output_path)
+
+    if not df.empty:
+        print(f"Date range: {_get_date_range(df)}")
+
+    write_posts(df, output_path, format)
+    print(f"Data successfully saved to '{output_path}'.")
+
+
 def _get_date_range(df):
     """Return the date range of valid dates in the DataFrame."""
     valid_dates = df["date"].dropna()
@@ -0,0 +1,241 @@
+import argparse
+import csv
+import heapq
+import re
+import zlib
+from array import array
+from collections import Counter, defaultdict
+
+from .decoding import get_decoder
+from .name_matching import NameIndex, standardize_name
+from .sources import open_source, resolve_sources
+
+HANDLE_PATTERN = re.compile(rb'@\w+')
+
+# Bytes of lines read from an archive at a time
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Separates screen name and display name in the keys of RosterScan.users
+_KEY_SEPARATOR = "\t"
+
+
+class HeavyHitters:
+    """
+    Bounded-memory frequency counter: a count-min sketch plus the k items with the highest counts.
+
+    Estimates never undercount, and overcount by at most about 2 * total / width with high
+    probability, so the top k are reliable for the frequent handles and names we care about.
+    Memory is depth * width counters plus k items, however many distinct items are added.
+
+    Args:
+        k (int): Number of most frequent items to keep.
+        width (int): Counters per sketch row.
+        depth (int): Number of sketch rows (independent hashes).
+    """
+
+    def __init__(self, k=5000, width=1 << 20, depth=4):
+        if k < 1:
+            raise ValueError(f"HeavyHitters needs k >= 1 items to keep, got {k}.")
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.total = 0
+
+        self._rows = [array('q', bytes(8 * width)) for _ in range(depth)]
+        self._top = {}
+        self._heap = []
+
+    def add(self, item, count=1):
+        data = item.encode('utf-8')
+        estimate = None
+        for seed, row in enumerate(self._rows):
+            slot = zlib.crc32(data, seed) % self.width
+            row[slot] += count
+            estimate = row[slot] if estimate is None else min(estimate, row[slot])
+        self.total += count
+
+        if item in self._top or len(self._top) < self.k:
+            self._top[item] = estimate
+            heapq.heappush(self._heap, (estimate, item))
+        elif estimate > self._min_top_count():
+            _, evicted = heapq.heappop(self._heap)
+            del self._top[evicted]
+            self._top[item] = estimate
+            heapq.heappush(self._heap, (estimate, item))
+
+        # Drop stale heap entries left behind by updated counts
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(count, item) for item, count in self._top.items()]
+            heapq.heapify(self._heap)
+
+    def most_common(self, n=None):
+        items = sorted(self._top.items(), key=lambda pair: (-pair[1], pair[0]))
+        return items if n is None else items[:n]
+
+    def __getitem__(self, item):
+        return self._top.get(item, 0)
+
+    def __contains__(self, item):
+        return item in self._top
+
+    def _min_top_count(self):
+        while self._heap[0][0] != self._top.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0]
+
+
+class ExactCounter(Counter):
+    """Counter with the same interface as HeavyHitters, for archives whose vocabulary fits in memory."""
+
+    def add(self, item, count=1):
+        self[item] += count
+
+
+class RosterScan:
+    """Handle and user frequencies collected from a tweet archive by scan_archive."""
+
+    def __init__(self, handles, users):
+        self.handles = handles
+        self.users = users
+
+    def user_handles(self):
+        """Return {standardized display name: [(screen name, tweet count), ...]}, most frequent first."""
+        by_name = defaultdict(list)
+        for key, count in self.users.most_common():
+            screen_name, name = key.split(_KEY_SEPARATOR, 1)
+            by_name[standardize_name(name, nickname_map=None)].append((screen_name, count))
+        return by_name
+
+
+def scan_archive(json_file, k=5000, exact=False, json_backend="auto", chunk_bytes=READ_CHUNK_BYTES,
+                 count_users=True):
+    """
+    Count @handle mentions and (screen name, display name) pairs in one streaming pass.
+
+    Args:
+        json_file (str): Path, directory or glob of JSON-lines tweet archives, optionally compressed.
+        k (int): Number of most frequent handles and users to keep when not exact.
+        exact (bool): Count every distinct item exactly instead of using HeavyHitters.
+        json_backend (str): JSON decoder to use ('auto', 'orjson', 'simdjson' or 'json').
+        chunk_bytes (int): Bytes of lines read at a time.
+        count_users (bool): Also decode each line to count users. Without it only handles are counted.
+
+    Returns:
+        RosterScan: The handle counts and the user counts.
+    """
+    handles = ExactCounter() if exact else HeavyHitters(k)
+    users = ExactCounter() if exact else HeavyHitters(k)
+    loads = get_decoder(json_backend)
+
+    for source in resolve_sources(json_file):
+        with open_source(source) as file:
+            while True:
+                lines = file.readlines(chunk_bytes)
+                if not lines:
+                    break
+                for line in lines:
+                    for handle in HANDLE_PATTERN.findall(line):
+                        handles.add(handle.decode('utf-8'))
+                    if not count_users:
+                        continue
+                    for user in _users(line, loads):
+                        users.add(f"{user['screen_name']}{_KEY_SEPARATOR}{user['name']}")
+
+    return RosterScan(handles, users)
+
+
+def propose_handles(rows, scan, threshold=90):
+    """
+    Propose Twitter handles for the roster rows whose 'Twitter' is "NONE".
+
+    A row whose standardized name exactly matches an account's display name gets that account's
+    most frequent screen name; otherwise the closest display name scoring above the threshold
+    is used. Rows with a proposal get 'Twitter', 'Match score' and 'Tweets' filled in.
+
+    Args:
+        rows (list): Roster rows (dicts with 'Name' and 'Twitter').
+        scan (RosterScan): The result of scan_archive.
+        threshold (int): Minimum fuzzy-match score for a proposal.
+
+    Returns:
+        list: The rows, with proposals filled in.
+    """
+    user_handles = scan.user_handles()
+    index = NameIndex([{'Name': name} for name in user_handles], nickname_map=None)
+
+    for row in rows:
+        if row['Twitter'] != "NONE":
+            continue
+
+        name = standardize_name(row['Name'], nickname_map=None)
+        if name in user_handles:
+            matched_name, score = name, 100
+        else:
+            entry, matched_name, score = index.match(name, threshold, standardized=True)
+            if entry is None:
+                continue
+
+        screen_name, count = user_handles[matched_name][0]
+        row['Twitter'] = f"@{screen_name}"
+        row['Match score'] = score
+        row['Tweets'] = count
+
+    return rows
+
+
+def _users(line, loads):
+    """Return the users (poster, retweeted and quoted) of one line of tweet JSON."""
+    try:
+        tweet = loads(line)
+    except ValueError:
+        return []
+
+    users = []
+    for status in (tweet, tweet.get('retweeted_status'), tweet.get('quoted_status')):
+        if status and status.get('user'):
+            user = status['user']
+            if user.get('screen_name') and user.get('name'):
+                users.append({'screen_name': user['screen_name'], 'name': user['name']})
+    return users
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the Twitter handles of roster rows marked NONE.")
+    parser.add_argument('--input', required=True, help="Tweet archive: a file, directory or glob of JSON-lines files")
+    parser.add_argument('--roster', required=True, help="Roster CSV with 'Name' and 'Twitter' columns")
+    parser.add_argument('--output', required=True, help="Where to write the roster with proposed handles")
+    parser.add_argument('--top-k', type=_positive_int, default=5000, help="Most frequent handles and users to keep")
+    parser.add_argument('--exact', action='store_true', help="Count every handle and user exactly")
+    parser.add_argument('--threshold', type=int, default=90, help="Minimum fuzzy-match score for a proposal")
+    args = parser.parse_args(argv)
+
+    scan = scan_archive(args.input, k=args.top_k, exact=args.exact)
+
+    with open(args.roster, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+
+    rows = propose_handles(rows, scan, args.threshold)
+
+    fieldnames = list(rows[0].keys()) if rows else []
+    for extra in ('Match score', 'Tweets'):
+        if extra not in fieldnames:
+            fieldnames.append(extra)
+
+    with open(args.output, 'w', encoding='utf-8', newline='') as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Most mentioned handles: {scan.handles.most_common(10)}")
+    print(f"Roster with proposed handles has been created: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import os
+from pathlib import Path
+
+# Compression suffix -> name of the codec used to stream-decompress it
+CODECS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+    ".zst": "zstd",
+}
+
+JSON_SUFFIXES = (".json", ".jsonl", ".ndjson")
+
+
+def resolve_sources(path):
+    """
+    Return the sorted list of tweet archive files named by a path, directory or glob.
+
+    A directory yields every JSON-lines file in it (.json, .jsonl or .ndjson, optionally
+    compressed with one of CODECS). Sorting by name keeps the output order deterministic,
+    and puts daily shards named by date in date order.
+    """
+    path = str(path)
+
+    if any(char in path for char in "*?["):
+        sources = [source for source in glob.glob(path) if os.path.isfile(source)]
+    elif os.path.isdir(path):
+        sources = [str(source) for source in Path(path).iterdir() if source.is_file() and _is_json_lines(source)]
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Tweet archive not found: {path}")
+        sources = [path]
+
+    if not sources:
+        raise FileNotFoundError(f"No tweet archives found at: {path}")
+    return sorted(sources)
+
+
+def codec_for(path):
+    """Return the compression codec of a file from its suffix, or None if it is plain text."""
+    return CODECS.get(Path(path).suffix.lower())
+
+
+def open_source(path):
+    """Open an archive for reading lines as bytes, decompressing it on the fly if needed."""
+    codec = codec_for(path)
+
+    if codec is None:
+        return open(path, 'rb')
+    if codec == "gzip":
+        return gzip.open(path, 'rb')
+    if codec == "bz2":
+        return bz2.open(path, 'rb')
+    if codec == "lzma":
+        return lzma.open(path, 'rb')
+
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Reading .zst archives requires zstandard. Install it with 'pip install zstandard'.") from e
+
+    file = open(path, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(file, closefd=True)
+    return io.BufferedReader(reader)
+
+
+def _is_json_lines(path):
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in CODECS:
+        suffixes = suffixes[:-1]
+    return bool(suffixes) and suffixes[-1] in JSON_SUFFIXES
@@ -0,0 +1,54 @@
+import re
+
+# (rule name, pattern, replacement)
+RULES = [
+    ("replace_amp", r'&amp;', '&'),
+    ("strip_newlines", r'[\r\n]', ' '),
+    ("remove_links", r'http[s]?://\S+', ''),
+    ("remove_retweet_handles", r'\bRT\s+@\w+:\s*', ''),
+]
+
+
+class TextNormalizer:
+    """
+    Clean tweet text in a single scan with one precompiled regex.
+
+    The enabled rules are joined into one alternation, so each string is scanned and copied
+    once however many rules apply, and the result is stripped of surrounding whitespace.
+
+    Args:
+        replace_amp (bool): Replace '&amp;' with '&'.
+        strip_newlines (bool): Replace newlines and carriage returns with spaces.
+        remove_links (bool): Remove http(s) links.
+        remove_retweet_handles (bool): Remove "RT @twitterhandle:" prefixes.
+    """
+
+    def __init__(self, replace_amp=True, strip_newlines=True, remove_links=True, remove_retweet_handles=True):
+        enabled = {
+            "replace_amp": replace_amp,
+            "strip_newlines": strip_newlines,
+            "remove_links": remove_links,
+            "remove_retweet_handles": remove_retweet_handles,
+        }
+        rules = [(name, pattern, replacement) for name, pattern, replacement in RULES if enabled[name]]
+        if not rules:
+            raise ValueError("TextNormalizer needs at least one rule enabled.")
+
+        self.pattern = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in rules))
+        self._replacements = {name: replacement for name, _, replacement in rules}
+
+    def normalize(self, text):
+        """Clean a single string. Values that are not strings (such as NaN) are returned as is."""
+        if not isinstance(text, str):
+            return text
+        return self.pattern.sub(self._replace, text).strip()
+
+    def normalize_series(self, series):
+        """Clean every string in a pandas Series, leaving missing values as they are."""
+        return series.str.replace(self.pattern, self._replace, regex=True).str.strip()
+
+    def __call__(self, text):
+        return self.normalize(text)
+
+    def _replace(self, match):
+        return self._replacements[match.lastgroup]
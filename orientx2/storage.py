@@ -0,0 +1,189 @@
+from pathlib import Path
+
+import pandas as pd
+
+# Low-cardinality text columns, stored dictionary-encoded in Parquet
+CATEGORICAL_COLUMNS = ["name", "party", "referendum vote"]
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+FORMATS = ("csv", "parquet")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def infer_format(path, format=None):
+    """Return the storage format for a path, from its suffix unless given explicitly."""
+    if format is not None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format '{format}'. Please choose one of {FORMATS}.")
+        return format
+    return "parquet" if Path(path).suffix.lower() in PARQUET_SUFFIXES else "csv"
+
+
+def with_format_suffix(path, format):
+    """Return the path with the suffix that matches the given format."""
+    return Path(path).with_suffix(".parquet" if format == "parquet" else ".csv")
+
+
+def read_posts(path, columns=None, format=None):
+    """
+    Read a table of posts written by write_posts.
+
+    Args:
+        path (str): Path to a CSV or Parquet file.
+        columns (list): Only read these columns. Parquet skips the other columns entirely.
+        format (str): 'csv' or 'parquet'; inferred from the suffix when None.
+
+    Returns:
+        pd.DataFrame: The posts, with 'date' as a datetime column.
+    """
+    if infer_format(path, format) == "parquet":
+        _require_pyarrow()
+        return pd.read_parquet(path, columns=columns)
+
+    df = pd.read_csv(path, usecols=columns)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def iter_posts(path, chunk_rows, columns=None, format=None):
+    """
+    Read a table of posts chunk by chunk, so memory is bounded by chunk_rows rather than the file.
+
+    Args:
+        path (str): Path to a CSV or Parquet file.
+        chunk_rows (int): Number of rows per chunk.
+        columns (list): Only read these columns.
+        format (str): 'csv' or 'parquet'; inferred from the suffix when None.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of posts, with 'date' as a datetime column.
+    """
+    if infer_format(path, format) == "parquet":
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+        if "date" in chunk.columns:
+            chunk["date"] = pd.to_datetime(chunk["date"])
+        yield chunk
+
+
+def count_posts(path, format=None):
+    """Return the number of posts in a table, from the metadata for Parquet."""
+    if infer_format(path, format) == "parquet":
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+
+    first_column = pd.read_csv(path, nrows=0).columns[:1].tolist()
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=first_column, chunksize=1_000_000))
+
+
+def write_posts(df, path, format=None):
+    """Write a table of posts as CSV or Parquet."""
+    writer = PostsWriter(path, format)
+    try:
+        writer.write(df)
+    finally:
+        writer.close()
+
+
+class PostsWriter:
+    """
+    Write a table of posts chunk by chunk as CSV or Parquet.
+
+    Parquet output stores 'date' as a timestamp, the CATEGORICAL_COLUMNS as dictionary-encoded
+    strings and 'orientation' as int8. Every chunk is converted to the schema of the first one.
+    """
+
+    def __init__(self, path, format=None, append=False):
+        self.path = path
+        self.format = infer_format(path, format)
+        self.append = append
+
+        if self.format == "parquet":
+            _require_pyarrow()
+            if append:
+                raise ValueError("Parquet files cannot be appended to.")
+
+        self._started = False
+        self._schema = None
+        self._parquet_writer = None
+
+    def write(self, df):
+        if self.format == "parquet":
+            self._write_parquet(df)
+        else:
+            self._write_csv(df)
+        self._started = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def _write_csv(self, df):
+        header = not self._started and not (self.append and _is_non_empty(self.path))
+        mode = "a" if self._started or self.append else "w"
+        df.to_csv(self.path, mode=mode, header=header, index=False, encoding="utf-8", date_format=DATE_FORMAT)
+
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        df = _to_storage_types(df)
+        if self._schema is None:
+            self._schema = _parquet_schema(df)
+            self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._parquet_writer.write_table(table)
+
+
+def _to_storage_types(df):
+    df = df.copy()
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    if "orientation" in df.columns:
+        df["orientation"] = df["orientation"].astype("Int8")
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _parquet_schema(df):
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for column in df.columns:
+        if column == "date":
+            field = pa.field(column, pa.timestamp("us"))
+        elif column in CATEGORICAL_COLUMNS:
+            field = pa.field(column, pa.dictionary(pa.int32(), pa.string()))
+        elif column == "orientation":
+            field = pa.field(column, pa.int8())
+        else:
+            continue
+        schema = schema.set(schema.get_field_index(column), field)
+    return schema
+
+
+def _is_non_empty(path):
+    path = Path(path)
+    return path.exists() and path.stat().st_size > 0
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet support requires pyarrow. Install it with 'pip install pyarrow'.") from e
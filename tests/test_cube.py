@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pandas as pd
+
+# The analyzer modules import each other by module name, as when run from orientx2/analyzer
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'orientx2', 'analyzer'))
+
+from cube import AggregateCube  # noqa: E402
+
+
+def test_posts_without_a_date_are_left_out():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2016-06-01 09:00', None, '2016-06-03 18:30', '2016-06-03 20:00']),
+        'name': ['Ann', 'Bob', 'Ann', 'Cat'],
+        'party': ['Labour', 'Labour', 'Labour', 'Conservative'],
+        'referendum vote': ['Remain', 'Remain', 'Remain', 'Leave'],
+        'orientation': [1, 2, 0, None],
+    })
+
+    cube = AggregateCube.from_df(df)
+
+    assert cube.num_days == 3
+    assert cube.num_mps == 2
+    counts, totals = cube.label_counts()
+    assert counts.tolist() == [[0, 1, 0], [0, 0, 0], [1, 0, 0]]
+    assert totals.tolist() == [1, 0, 2]
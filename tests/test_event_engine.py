@@ -0,0 +1,11 @@
+import numpy as np
+
+from orientx2.analyzer.event_engine import DayLabelCounts
+
+
+def test_posts_without_a_day_are_left_out():
+    counts = DayLabelCounts([0, np.nan, 2, 2], [1, 1, 0, np.nan], labels=(0, 1))
+
+    assert counts.num_days == 3
+    assert counts.totals.tolist() == [1, 0, 2]
+    assert counts.counts.tolist() == [[0, 1], [0, 0], [1, 0]]
@@ -0,0 +1,9 @@
+from orientx2.parser.text_normalizer import TextNormalizer
+
+
+def test_removes_retweet_handle_split_by_newline():
+    # The old pipeline stripped newlines before removing "RT @handle:", so these were cleaned too
+    normalizer = TextNormalizer()
+    assert normalizer("RT\n@handle: Vote leave") == "Vote leave"
+    assert normalizer("RT\r\n@handle: Vote leave https://t.co/abc") == "Vote leave"
+    assert normalizer("RT @handle: Vote &amp; leave") == "Vote & leave"
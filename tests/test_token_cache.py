@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+
+from orientx2.classifier.token_cache import TokenCache
+
+
+class WordTokenizer:
+    """Maps each word to a fixed id, like a tokenizer with [CLS] = 2 and [SEP] = 3."""
+
+    name_or_path = "word-tokenizer"
+    is_fast = False
+    vocab = {"a": 1, "b": 7}
+
+    def get_vocab(self):
+        return dict(self.vocab)
+
+    def __call__(self, texts, max_length, truncation=True):
+        ids = [[2] + [self.vocab.get(word, 0) for word in text.split()][:max_length - 2] + [3] for text in texts]
+        return {'input_ids': ids}
+
+
+def test_interrupted_store_does_not_shift_later_entries(tmp_path):
+    with TokenCache(str(tmp_path), WordTokenizer(), max_length=16) as cache:
+        cache.encode(["a a a"])
+
+    # A run that died after writing its token ids but before committing their index entries
+    segment_path = os.path.join(str(tmp_path), 'segment-000001.bin')
+    with open(segment_path, 'ab') as file:
+        file.write(np.full(5, 7, dtype=np.int32).tobytes())
+
+    with TokenCache(str(tmp_path), WordTokenizer(), max_length=16) as cache:
+        cache.encode(["b b"])
+
+    with TokenCache(str(tmp_path), WordTokenizer(), max_length=16) as cache:
+        first, second = cache.encode(["a a a", "b b"])
+        assert cache.misses == 0
+    assert first.tolist() == [2, 1, 1, 1, 3]
+    assert second.tolist() == [2, 7, 7, 3]